@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -19,10 +20,98 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str
     AWS_REGION: str
     AWS_S3_BUCKET_NAME: str
+    AWS_S3_ENDPOINT_URL: Optional[str] = None  # Override for a local S3 stand-in (MinIO, moto)
+    # CDN in front of the bucket, e.g. https://cdn.example.com; image URLs use it when set
+    PUBLIC_ASSET_BASE_URL: Optional[str] = None
+    IMAGE_MAX_UPLOAD_MB: int = 5
+    IMAGE_UPLOAD_URL_EXPIRES_SECONDS: int = 10 * 60
+    # Server-side uploads: executor threads x per-upload multipart threads = pool size
+    S3_UPLOAD_WORKERS: int = 8
+    S3_MULTIPART_THRESHOLD_MB: int = 8
+    S3_MULTIPART_CHUNKSIZE_MB: int = 8
+    S3_MULTIPART_CONCURRENCY: int = 4
+    # Product image variants (outbox job, rendered in a process pool)
+    IMAGE_PROCESS_WORKERS: int = 2
+    IMAGE_VARIANT_WIDTHS: list[int] = [320, 800]
 
     # Stripe Configuration
     STRIPE_SECRET_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    STRIPE_API_BASE: Optional[str] = None  # Override to point at a fake server
+    STRIPE_EXECUTOR_WORKERS: int = 16
+
+    # Stock Reservations (holds between checkout and payment)
+    RESERVATION_TTL_SECONDS: int = 15 * 60
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = 30
+    RESERVATION_SWEEP_BATCH_SIZE: int = 500
+
+    # Transactional Outbox (external side effects, see app/workers/outbox_worker.py)
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 2.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 300.0
+    # Image variant jobs get their own lane: slow renders never hold up payment intents
+    OUTBOX_IMAGE_WORKERS: int = 1
+    OUTBOX_IMAGE_BATCH_SIZE: int = 2
+    OUTBOX_IMAGE_LEASE_SECONDS: int = 10 * 60
+    # Create the intent during the checkout request; otherwise only the worker does
+    PAYMENT_INTENT_INLINE: bool = True
+    OUTBOX_INLINE_GRACE_SECONDS: int = 30
+
+    # Stripe webhook ingestion queue (see app/workers/webhook_worker.py)
+    WEBHOOK_WORKERS: int = 2
+    WEBHOOK_BATCH_SIZE: int = 50
+    WEBHOOK_POLL_INTERVAL_SECONDS: float = 0.5
+    WEBHOOK_LEASE_SECONDS: int = 60
+    WEBHOOK_MAX_ATTEMPTS: int = 10
+    WEBHOOK_BACKOFF_BASE_SECONDS: float = 1.0
+    WEBHOOK_BACKOFF_MAX_SECONDS: float = 120.0
+    WEBHOOK_DEDUP_CACHE_SIZE: int = 10_000
+    # Stripe retries for up to 3 days; keep ids well past that for dedup
+    WEBHOOK_RETENTION_DAYS: int = 30
+    WEBHOOK_PRUNE_INTERVAL_SECONDS: int = 60 * 60
+    WEBHOOK_PRUNE_BATCH_SIZE: int = 5000
+
+    # Idempotency-Key replay for POST /orders/checkout
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # Max wait on a duplicate in another worker
+    # An unfinished claim older than this is presumed dead (crashed worker) and taken over
+    IDEMPOTENCY_CLAIM_LEASE_SECONDS: int = 120
+    # Retention pruner (idempotency keys, gateway payloads)
+    RETENTION_PRUNE_INTERVAL_SECONDS: int = 60 * 60
+    RETENTION_PRUNE_BATCH_SIZE: int = 5000
+
+    # Raw gateway responses: "compressed" keeps them in payment_gateway_payloads
+    # for PAYMENT_PAYLOAD_RETENTION_DAYS (0 = forever), "none" drops them
+    PAYMENT_PAYLOAD_STORAGE: str = "compressed"
+    PAYMENT_PAYLOAD_RETENTION_DAYS: int = 90
+
+    # GET /orders/{id}/events (SSE), fanned out across processes via LISTEN/NOTIFY
+    ORDER_EVENTS_CHANNEL: str = "order_events"
+    ORDER_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    ORDER_EVENTS_MAX_STREAM_SECONDS: int = 600
+
+    # Flash-sale admission (Product.flash_sale); toggles apply within one refresh
+    FLASH_SALE_REFRESH_SECONDS: float = 2.0
+    FLASH_SALE_CONCURRENCY: int = 4  # Checkouts per product past admission at once
+    FLASH_SALE_QUEUE_TIMEOUT_SECONDS: float = 10.0
+
+    # Logging: records go through a bounded queue to a background writer
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10_000  # Full queue: INFO and below are dropped
+    # Per-logger levels; repositories log every call, so they start at WARNING
+    LOG_LEVELS: dict[str, str] = {"fastapi_app.app.repositories": "WARNING"}
+    # Fraction of sub-WARNING records kept per logger prefix, e.g. {"fastapi_app.app.routers": 0.1}
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    LOG_FORMAT: str = "json"  # "json" (one object per line) or "text"
+    # Fraction of requests whose INFO records are written; errors and slow requests always are
+    LOG_SUCCESS_SAMPLE_RATE: float = 1.0
+    LOG_SLOW_REQUEST_MS: int = 1000
+    LOG_HELD_RECORDS_MAX: int = 200  # Per request; older held records are discarded
 
     # Payment Gateway
     # PAYMENT_GATEWAY_URL: str
@@ -0,0 +1,112 @@
+import time
+import uuid
+from typing import Optional
+from app.core.config import settings
+from app.utils.log_config import logger, begin_request, end_request
+from app.utils.metrics import (
+    DB_REQUEST_DURATION,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    begin_db_timing,
+    end_db_timing,
+)
+
+MAX_REQUEST_ID_LENGTH = 128
+
+
+def _request_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            request_id = value.decode("latin-1").strip()
+            if request_id and len(request_id) <= MAX_REQUEST_ID_LENGTH:
+                return request_id
+            break
+    return uuid.uuid4().hex
+
+
+def _route_template(scope) -> Optional[str]:
+    # Set by the router on match: /orders/{order_id}, not /orders/42
+    route = scope.get("route")
+    return route.path if route else None
+
+
+def _access_fields(scope, status: int, duration_ms: float) -> dict:
+    client = scope.get("client")
+    return {
+        "method": scope["method"],
+        "route": _route_template(scope) or scope["path"],
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+        "client": client[0] if client else None,
+    }
+
+
+class RequestMiddleware:
+    """
+    Request id, access log, uncaught-exception log and metrics in one raw
+    ASGI layer. Unlike @app.middleware("http") it doesn't run the app in a
+    separate task or re-stream the body, so streaming responses (order
+    events) go straight through and their duration covers the whole stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id  # request.state.request_id
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+        status = 500  # Until the app starts a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), request_id_header]
+            await send(message)
+
+        token = begin_request(request_id)
+        db_token = begin_db_timing()
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        keep = True
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            duration_ms = (time.perf_counter() - start) * 1000
+            logger.error(
+                "Uncaught exception: %s %s | %.2fms | Error: %s",
+                scope["method"],
+                scope["path"],
+                duration_ms,
+                str(e),
+                exc_info=True,
+                extra=_access_fields(scope, status, duration_ms),
+            )
+            # Re-raise to let Starlette's ServerErrorMiddleware send the 500
+            raise
+        else:
+            duration_ms = (time.perf_counter() - start) * 1000
+            keep = status >= 500 or duration_ms >= settings.LOG_SLOW_REQUEST_MS
+            logger.info(
+                "%s %s %s | %.2fms",
+                scope["method"],
+                scope["path"],
+                status,
+                duration_ms,
+                extra=_access_fields(scope, status, duration_ms),
+            )
+        finally:
+            seconds = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            # Unmatched paths share one label so scanners can't blow up the series count
+            route = _route_template(scope) or "<unmatched>"
+            HTTP_REQUESTS.inc(scope["method"], route, status)
+            HTTP_REQUEST_DURATION.observe(seconds, scope["method"], route, status)
+            DB_REQUEST_DURATION.observe(end_db_timing(db_token), scope["method"], route)
+            end_request(token, keep)
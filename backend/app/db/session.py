@@ -1,9 +1,11 @@
+import time
 from urllib.parse import quote_plus
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.core.config import settings
 from app.utils.log_config import logger
+from app.utils.metrics import record_query
 
 # Construct the URL
 DATABASE_URL = f"postgresql://{settings.DB_USER}:{quote_plus(settings.DB_PASSWORD)}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
@@ -16,6 +18,18 @@ engine = create_engine(
     pool_pre_ping=True,  # Checks if RDS connection is alive before using it
 )
 
+
+# Per-statement timing for /metrics; a connection runs one statement at a time
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    record_query(time.perf_counter() - conn.info["query_started"])
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
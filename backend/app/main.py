@@ -1,11 +1,21 @@
-import time
-from fastapi import FastAPI, Request
+import asyncio
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.routers.v1 import auth, products, ecommerce, profile, orders, webhooks
 from app.db.session import engine
+from app.workers.reservation_sweeper import run_reservation_sweeper
+from app.workers.outbox_worker import run_outbox_pool
+from app.workers.webhook_worker import run_webhook_pool
+from app.workers.retention_pruner import run_retention_pruner
+from app.workers.partition_maintenance import run_partition_maintainer
+from app.workers.order_event_listener import run_order_event_listener
+from app.workers.flash_sale_refresher import run_flash_sale_refresher
+from app.core.middleware import RequestMiddleware
 from app.utils.log_config import logger
+from app.utils.metrics import render as render_metrics
 
 
 # setup fastapi lifespan
@@ -18,9 +28,22 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error("Error connecting to DB: %s", e)
 
+    background = [
+        asyncio.create_task(run_reservation_sweeper()),
+        asyncio.create_task(run_outbox_pool()),
+        asyncio.create_task(run_webhook_pool()),
+        asyncio.create_task(run_retention_pruner()),
+        asyncio.create_task(run_partition_maintainer()),
+        asyncio.create_task(run_order_event_listener()),
+        asyncio.create_task(run_flash_sale_refresher()),
+    ]
+
     yield  # BEFORE: startup, AFTER: shutdown
     logger.info("Application shut down.")
 
+    for task in background:
+        task.cancel()
+
     # db connection close
     engine.dispose()
     logger.info("DB connection closed.")
@@ -47,52 +70,8 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start = time.perf_counter()
-    try:
-        response = await call_next(request)
-        duration_ms = (time.perf_counter() - start) * 1000
-        client = request.client.host if request.client else "unknown"
-        logger.info(
-            "%s %s %s | %s | %.2fms",
-            request.method,
-            request.url.path,
-            response.status_code,
-            client,
-            duration_ms,
-        )
-        return response
-    except Exception as e:
-        duration_ms = (time.perf_counter() - start) * 1000
-        client = request.client.host if request.client else "unknown"
-        logger.error(
-            "Request failed: %s %s | %s | %.2fms | Error: %s",
-            request.method,
-            request.url.path,
-            client,
-            duration_ms,
-            str(e),
-            exc_info=True,
-        )
-        raise
-
-
-@app.middleware("http")
-async def exception_handler(request: Request, call_next):
-    """Catch and log all uncaught exceptions"""
-    try:
-        return await call_next(request)
-    except Exception as e:
-        logger.critical(
-            "Uncaught exception: %s %s | Error: %s",
-            request.method,
-            request.url.path,
-            str(e),
-            exc_info=True,
-        )
-        # Re-raise to let FastAPI's default error handler deal with it
-        raise
+# Outermost of ours (added last): times CORS handling too
+app.add_middleware(RequestMiddleware)
 
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
@@ -101,3 +80,9 @@ app.include_router(products.router, prefix="/api/v1/products", tags=["Products"]
 app.include_router(ecommerce.router, prefix="/api/v1/shop", tags=["E-commerce"])
 app.include_router(orders.router, prefix="/api/v1/orders", tags=["Orders"])
 app.include_router(webhooks.router, prefix="/api/v1/webhooks", tags=["Webhooks"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape target (this worker's values)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -7,6 +7,7 @@ from sqlalchemy import (
     ForeignKey,
     Enum,
     UniqueConstraint,
+    Boolean,
 )
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
@@ -37,16 +38,18 @@ class CartItem(BaseModel):
     __tablename__ = "cart_items"
 
     cart_id = Column(
-        Integer, ForeignKey("carts.id", ondelete="CASCADE"), nullable=False
+        Integer, ForeignKey("carts.id", ondelete="CASCADE"), nullable=False, index=True
     )
     product_id = Column(
-        Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True
+        Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True, index=True
     )
     quantity = Column(Integer, default=1)
 
     # SNAPSHOTS: Prevent data loss if product is updated/deleted
     product_name_snapshot = Column(String(200))
     price_at_addition = Column(Float)
+    # Set by the bulk re-pricing job when the catalog price moved under the snapshot
+    price_changed = Column(Boolean, default=False, server_default="false")
 
     cart = relationship("Cart", back_populates="items")
     product = relationship("Product")
@@ -0,0 +1,36 @@
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    ForeignKey,
+    JSON,
+    Boolean,
+    DateTime,
+    UniqueConstraint,
+    Index,
+)
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+
+class IdempotencyRecord(BaseModel):
+    """First response to a client-supplied Idempotency-Key, replayed to retries"""
+
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    key = Column(String(255), nullable=False)
+    # sha256 of the request body; a reused key with a different body is rejected
+    request_hash = Column(String(64), nullable=False)
+    completed = Column(Boolean, default=False, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSON, nullable=True)
+    # Lease on an in-progress claim; a stale one (crashed worker) can be taken over
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="_user_idempotency_key_uc"),
+        Index("ix_idempotency_keys_created_at", "created_at"),  # Pruning
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer
+from app.models.base import BaseModel
+
+
+class ImageObject(BaseModel):
+    """
+    Rows referencing an S3 image (products.image_url, profiles.profile_picture).
+    Content-addressed keys are shared. updated_at is stamped on every upload
+    and reference; image_gc spares objects stamped within its grace period.
+    ref_count is bookkeeping only: database cascades bypass release().
+    """
+
+    __tablename__ = "image_objects"
+
+    key = Column(String(500), unique=True, nullable=False)
+    ref_count = Column(Integer, default=0, server_default="0", nullable=False)
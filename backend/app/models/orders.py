@@ -1,7 +1,20 @@
 import enum
 import uuid
-from sqlalchemy import Column, String, Integer, Float, ForeignKey, Enum, JSON, DateTime
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Float,
+    ForeignKey,
+    Enum,
+    DateTime,
+    Index,
+    Text,
+    LargeBinary,
+    FetchedValue,
+)
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func, text
 from app.models.base import BaseModel
 
 
@@ -16,11 +29,51 @@ class OrderStatus(enum.Enum):
     INITIATED = "initiated"
     CONFIRMED = "confirmed"
     CANCELLED = "cancelled"
+    INSUFFICIENT_STOCK = "insufficient_stock"  # Paid, but stock ran out: refunded via the outbox
 
 
-class Order(BaseModel):
+class ReservationStatus(enum.Enum):
+    HELD = "held"  # Counted in Product.reserved
+    CONVERTED = "converted"  # Turned into a stock decrement on payment
+    RELEASED = "released"  # Payment failed or hold expired
+
+
+# orders, order_items and payment_attempts are range-partitioned by month on
+# created_at (migration 7e2b5d9a4c31, maintained by app/workers/partition_maintenance.py).
+# Postgres can't enforce FKs or unique constraints into them on `id` alone, so
+# the order_id links below are app-level: relationships use explicit joins.
+PARTITIONED = {"postgresql_partition_by": "RANGE (created_at)"}
+
+
+class PartitionedModel(BaseModel):
+    """
+    The partitioned tables' primary key is (id, created_at), as in the
+    migration: db.get() takes both, and filtering on created_at lets
+    Postgres skip the other months' partitions.
+    """
+
+    __abstract__ = True
+    # Filled from the {table}_id_seq default the migration kept; fetched via RETURNING
+    id = Column(Integer, primary_key=True, index=True, server_default=FetchedValue())
+    created_at = Column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now()
+    )
+
+
+class Order(PartitionedModel):
     __tablename__ = "orders"
 
+    # Order history: keyset pages per user, newest first
+    __table_args__ = (
+        Index(
+            "ix_orders_user_id_created_at",
+            "user_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+        PARTITIONED,
+    )
+
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
@@ -34,17 +87,28 @@ class Order(BaseModel):
     )
 
     order_items = relationship(
-        "OrderItem", back_populates="order", cascade="all, delete-orphan"
+        "OrderItem",
+        primaryjoin="Order.id == foreign(OrderItem.order_id)",
+        back_populates="order",
+        cascade="all, delete-orphan",
+    )
+    payment_attempts = relationship(
+        "PaymentAttempt",
+        primaryjoin="Order.id == foreign(PaymentAttempt.order_id)",
+        back_populates="order",
+    )
+    reservations = relationship(
+        "StockReservation",
+        primaryjoin="Order.id == foreign(StockReservation.order_id)",
+        back_populates="order",
     )
-    payment_attempts = relationship("PaymentAttempt", back_populates="order")
 
 
-class OrderItem(BaseModel):
+class OrderItem(PartitionedModel):
     __tablename__ = "order_items"
+    __table_args__ = (PARTITIONED,)
 
-    order_id = Column(
-        Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False
-    )
+    order_id = Column(Integer, nullable=False, index=True)  # -> orders.id
     product_id = Column(
         Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True
     )
@@ -52,26 +116,73 @@ class OrderItem(BaseModel):
     product_name_snapshot = Column(String(200), nullable=False)
     price_per_unit = Column(Float, nullable=False)
 
-    order = relationship("Order", back_populates="order_items")
+    order = relationship(
+        "Order",
+        primaryjoin="foreign(OrderItem.order_id) == Order.id",
+        back_populates="order_items",
+    )
 
 
-class PaymentAttempt(BaseModel):
+class PaymentAttempt(PartitionedModel):
     __tablename__ = "payment_attempts"
+    __table_args__ = (PARTITIONED,)
 
-    order_id = Column(
-        Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False
-    )
+    order_id = Column(Integer, nullable=False, index=True)  # -> orders.id
 
-    # Unique strings for S2S
-    external_order_id = Column(String(100), unique=True, index=True)
+    # Unique strings for S2S (unique by construction: Stripe ids / one key per
+    # order; partitioning rules out a global unique index)
+    external_order_id = Column(String(100), index=True)
     external_customer_id = Column(String(100))
-    idempotency_key = Column(String(100), unique=True)
+    idempotency_key = Column(String(100), index=True)
 
     amount = Column(Float, nullable=False)
     currency = Column(String(10), default="USD")
     status = Column(Enum(PaymentAttemptStatus), default=PaymentAttemptStatus.INITIATED)
 
-    # Store the full response from the S2S app for debugging
-    gateway_response = Column(JSON, nullable=True)
+    # The gateway fields we read; the raw response lives in payment_gateway_payloads
+    gateway_status = Column(String(50), nullable=True)
+    client_secret = Column(String(255), nullable=True)
+    gateway_error = Column(Text, nullable=True)
 
-    order = relationship("Order", back_populates="payment_attempts")
+    order = relationship(
+        "Order",
+        primaryjoin="foreign(PaymentAttempt.order_id) == Order.id",
+        back_populates="payment_attempts",
+    )
+
+
+class PaymentGatewayPayload(BaseModel):
+    """Raw gateway response for an attempt, compressed; kept for debugging only"""
+
+    __tablename__ = "payment_gateway_payloads"
+
+    attempt_id = Column(Integer, nullable=False, index=True)  # -> payment_attempts.id
+    codec = Column(String(10), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_payment_gateway_payloads_created_at", "created_at"),  # Pruning
+    )
+
+
+class StockReservation(BaseModel):
+    __tablename__ = "stock_reservations"
+
+    order_id = Column(Integer, nullable=False, index=True)  # -> orders.id
+    product_id = Column(
+        Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus), default=ReservationStatus.HELD)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    # The sweeper scans HELD rows by expiry
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+    )
+
+    order = relationship(
+        "Order",
+        primaryjoin="foreign(StockReservation.order_id) == Order.id",
+        back_populates="reservations",
+    )
@@ -0,0 +1,33 @@
+import enum
+from sqlalchemy import Column, String, Integer, Enum, JSON, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+
+class OutboxStatus(enum.Enum):
+    PENDING = "pending"  # Waiting for (re)delivery at next_attempt_at
+    PROCESSING = "processing"  # Leased by a worker until locked_until
+    DONE = "done"
+    FAILED = "failed"  # Gave up after OUTBOX_MAX_ATTEMPTS or a permanent error
+
+
+class OutboxEvent(BaseModel):
+    """
+    External side effects written in the same transaction as the business
+    change, then delivered by app/workers/outbox_worker.py.
+    """
+
+    __tablename__ = "outbox"
+
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    # Workers poll due rows by status
+    __table_args__ = (
+        Index("ix_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Boolean, JSON
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from app.models.base import BaseModel
 
 
@@ -11,8 +12,13 @@ class Product(BaseModel):
     model_name = Column(String(200), index=True, nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, default=0)
+    # Units held by unpaid checkouts (see StockReservation)
+    reserved = Column(Integer, default=0, server_default="0", nullable=False)
     description = Column(String(1000))
-    image_url = Column(String(500))  # S3 URL
+    # S3 URL; indexed so a shared (content-addressed) image's variants are found by URL
+    image_url = Column(String(500), index=True)
+    # Resized copies of image_url: {"<width>": {"webp": url, "jpg": url}}
+    image_variants = Column(JSON, nullable=True)
 
     # Mobile Specific Specs (Filtering)
     ram = Column(Integer)  # GB
@@ -24,9 +30,20 @@ class Product(BaseModel):
 
     # Status
     is_active = Column(Boolean, default=True)
+    # Hot-product mode: checkouts pass FlashSaleAdmission before touching the row lock
+    flash_sale = Column(Boolean, default=False, server_default="false", nullable=False)
 
     # Ownership
     seller_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     seller = relationship("User", back_populates="products")
+
+    @hybrid_property
+    def available_stock(self):
+        """Sellable units: physical stock minus active checkout holds"""
+        return (self.stock or 0) - (self.reserved or 0)
+
+    @available_stock.expression
+    def available_stock(cls):
+        return cls.stock - cls.reserved
@@ -0,0 +1,37 @@
+import enum
+from sqlalchemy import Column, String, Integer, Enum, JSON, DateTime, Text, Index
+from app.models.base import BaseModel
+
+
+class WebhookEventStatus(enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class WebhookEvent(BaseModel):
+    """
+    Raw Stripe events, persisted by /webhooks/stripe before any processing
+    and drained by app/workers/webhook_worker.py.
+    """
+
+    __tablename__ = "webhook_events"
+
+    # Stripe's evt_... id; redeliveries collide here and are dropped
+    event_id = Column(String(100), unique=True, nullable=False)
+    event_type = Column(String(100), nullable=False)
+    # pi_... id; events for the same intent are processed in arrival order
+    intent_id = Column(String(100), nullable=True, index=True)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(
+        Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING, nullable=False
+    )
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (Index("ix_webhook_events_status_id", "status", "id"),)
@@ -1,7 +1,11 @@
+from typing import Iterable, List
+from sqlalchemy import update, select, func
 from sqlalchemy.orm import Session
 from app.models.ecommerce import Cart, CartItem, CartStatus, Wishlist
 from app.models.product import Product
-from app.utils.log_config import logger
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
 
 
 class EcommerceRepository:
@@ -34,6 +38,86 @@ class EcommerceRepository:
             "EcommerceRepository.update_cart_total: cart_id=%s total=%s", cart.id, total
         )
 
+    @staticmethod
+    def recompute_cart_totals(db: Session, cart_ids: Iterable[int]):
+        """Set-based total refresh for the given carts (no ORM objects loaded)"""
+        cart_ids = list(cart_ids)
+        if not cart_ids:
+            return
+        subtotal = (
+            select(
+                func.coalesce(
+                    func.sum(CartItem.price_at_addition * CartItem.quantity), 0.0
+                )
+            )
+            .where(CartItem.cart_id == Cart.id)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(Cart)
+            .where(Cart.id.in_(cart_ids))
+            .values(total_amount=subtotal)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def reprice_cart(db: Session, cart_id: int) -> List[int]:
+        """
+        Re-prices every item of one cart against the live catalog in a single
+        UPDATE ... FROM products. Returns the ids of the items whose price moved.
+        Caller owns the transaction.
+        """
+        changed = db.execute(
+            update(CartItem)
+            .where(
+                CartItem.cart_id == cart_id,
+                CartItem.product_id == Product.id,
+                CartItem.price_at_addition.is_distinct_from(Product.price),
+            )
+            .values(price_at_addition=Product.price, price_changed=True)
+            .returning(CartItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        if changed:
+            EcommerceRepository.recompute_cart_totals(db, [cart_id])
+        logger.info(
+            "EcommerceRepository.reprice_cart: cart_id=%s changed_items=%d",
+            cart_id,
+            len(changed),
+        )
+        return changed
+
+    @staticmethod
+    def reprice_carts_for_product(db: Session, product_id: int) -> List[int]:
+        """
+        Re-prices the given product in every active cart holding it, then
+        refreshes those carts' totals. Returns the affected cart ids.
+        Caller owns the transaction.
+        """
+        cart_ids = db.execute(
+            update(CartItem)
+            .where(
+                CartItem.product_id == product_id,
+                CartItem.product_id == Product.id,
+                CartItem.cart_id == Cart.id,
+                Cart.status == CartStatus.CURRENT,
+                CartItem.price_at_addition.is_distinct_from(Product.price),
+            )
+            .values(price_at_addition=Product.price, price_changed=True)
+            .returning(CartItem.cart_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        affected = sorted(set(cart_ids))
+        EcommerceRepository.recompute_cart_totals(db, affected)
+        logger.info(
+            "EcommerceRepository.reprice_carts_for_product: product_id=%s carts=%d",
+            product_id,
+            len(affected),
+        )
+        return affected
+
     @staticmethod
     def toggle_wishlist(db: Session, user_id: int, product_id: int):
         existing = (
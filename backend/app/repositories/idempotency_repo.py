@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.idempotency import IdempotencyRecord
+
+
+class IdempotencyRepository:
+    @staticmethod
+    def claim(db: Session, user_id: int, key: str, request_hash: str) -> bool:
+        """Inserts an in-progress record. Returns False if the key already exists"""
+        inserted = db.execute(
+            pg_insert(IdempotencyRecord)
+            .values(user_id=user_id, key=key, request_hash=request_hash, completed=False)
+            .on_conflict_do_nothing(constraint="_user_idempotency_key_uc")
+            .returning(IdempotencyRecord.id)
+        ).first()
+        return inserted is not None
+
+    @staticmethod
+    def get(db: Session, user_id: int, key: str) -> Optional[dict]:
+        row = db.execute(
+            select(
+                IdempotencyRecord.request_hash,
+                IdempotencyRecord.completed,
+                IdempotencyRecord.status_code,
+                IdempotencyRecord.response,
+                IdempotencyRecord.created_at,
+                IdempotencyRecord.claimed_at,
+            ).where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key)
+        ).mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    def take_over(
+        db: Session, user_id: int, key: str, request_hash: str, claimed_before: datetime
+    ) -> bool:
+        """Renews an in-progress claim whose lease ran out. Returns False if someone else got it"""
+        renewed = db.execute(
+            update(IdempotencyRecord)
+            .where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.request_hash == request_hash,
+                IdempotencyRecord.completed.is_(False),
+                IdempotencyRecord.claimed_at < claimed_before,
+            )
+            .values(claimed_at=func.now())
+            .returning(IdempotencyRecord.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return renewed is not None
+
+    @staticmethod
+    def complete(db: Session, user_id: int, key: str, status_code: int, response):
+        db.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key)
+            .values(completed=True, status_code=status_code, response=response)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def release(db: Session, user_id: int, key: str, only_pending: bool = True):
+        """Forgets a key (by default only if still in progress) so it can be reused"""
+        query = delete(IdempotencyRecord).where(
+            IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key
+        )
+        if only_pending:
+            query = query.where(IdempotencyRecord.completed == False)
+        db.execute(query.execution_options(synchronize_session=False))
+
+    @staticmethod
+    def prune(db: Session, older_than: datetime, batch_size: int) -> int:
+        doomed = (
+            select(IdempotencyRecord.id)
+            .where(IdempotencyRecord.created_at < older_than)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        return db.execute(
+            delete(IdempotencyRecord)
+            .where(IdempotencyRecord.id.in_(doomed))
+            .execution_options(synchronize_session=False)
+        ).rowcount
@@ -0,0 +1,38 @@
+from typing import Optional
+from sqlalchemy import update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.images import ImageObject
+from app.services.s3_service import S3Service
+
+
+class ImageObjectRepository:
+    """Reference counts for stored images; changes join the caller's transaction"""
+
+    @staticmethod
+    def acquire(db: Session, url: Optional[str]):
+        key = S3Service.key_from_url(url) if url else None
+        if not key:
+            return
+        stmt = pg_insert(ImageObject).values(key=key, ref_count=1, updated_at=func.now())
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ImageObject.key],
+                set_={"ref_count": ImageObject.ref_count + 1, "updated_at": func.now()},
+            )
+        )
+
+    @staticmethod
+    def release(db: Session, url: Optional[str]):
+        key = S3Service.key_from_url(url) if url else None
+        if not key:
+            return
+        db.execute(
+            update(ImageObject)
+            .where(ImageObject.key == key)
+            .values(
+                ref_count=func.greatest(ImageObject.ref_count - 1, 0),
+                updated_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
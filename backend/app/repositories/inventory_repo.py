@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import update, select, insert, values, column, Integer, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.orders import StockReservation, ReservationStatus
+from app.models.product import Product
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _quantities_table(quantities: Dict[int, int]):
+    """Inline (VALUES ...) relation of product_id -> qty, ordered by id"""
+    return values(
+        column("product_id", Integer), column("qty", Integer), name="v"
+    ).data(sorted(quantities.items()))
+
+
+def _sum_by_product(rows) -> Dict[int, int]:
+    totals: Dict[int, int] = {}
+    for product_id, qty in rows:
+        totals[product_id] = totals.get(product_id, 0) + qty
+    return totals
+
+
+class InventoryRepository:
+    """
+    Stock holds between checkout and payment.
+    Every method is set-based and leaves the commit to the caller.
+    """
+
+    @staticmethod
+    def reserve(db: Session, order_id: int, quantities: Dict[int, int]) -> bool:
+        """
+        Atomically moves `quantities` from available into reserved stock.
+        Returns False (and reserves nothing) if any product lacks availability.
+        """
+        if not quantities:
+            return True
+        v = _quantities_table(quantities)
+        held = db.execute(
+            update(Product)
+            .where(
+                Product.id == v.c.product_id,
+                Product.stock - Product.reserved >= v.c.qty,
+            )
+            .values(reserved=Product.reserved + v.c.qty)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        if len(held) != len(quantities):
+            logger.warning(
+                "InventoryRepository.reserve: order_id=%s short on products=%s",
+                order_id,
+                sorted(set(quantities) - set(held)),
+            )
+            return False
+
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            seconds=settings.RESERVATION_TTL_SECONDS
+        )
+        db.execute(
+            insert(StockReservation),
+            [
+                {
+                    "order_id": order_id,
+                    "product_id": product_id,
+                    "quantity": qty,
+                    "status": ReservationStatus.HELD,
+                    "expires_at": expires_at,
+                }
+                for product_id, qty in sorted(quantities.items())
+            ],
+        )
+        return True
+
+    @staticmethod
+    def _take_holds(
+        db: Session, order_id: int, new_status: ReservationStatus
+    ) -> Dict[int, int]:
+        """Moves an order's HELD rows to `new_status`; returns product_id -> qty"""
+        rows = db.execute(
+            update(StockReservation)
+            .where(
+                StockReservation.order_id == order_id,
+                StockReservation.status == ReservationStatus.HELD,
+            )
+            .values(status=new_status)
+            .returning(StockReservation.product_id, StockReservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        return _sum_by_product(rows)
+
+    @staticmethod
+    def deduct(
+        db: Session, quantities: Dict[int, int], from_reserved: bool = False
+    ) -> bool:
+        """
+        One UPDATE products ... FROM (VALUES ...) WHERE stock >= qty.
+        Live-stock deductions (from_reserved=False) may only take units no
+        active hold covers, i.e. stock - reserved >= qty, as in reserve().
+        Returns True only if every product matched; on False the caller must
+        roll back (a savepoint is enough) since the matched rows were updated.
+        """
+        if not quantities:
+            return True
+        v = _quantities_table(quantities)
+        new_values = {"stock": Product.stock - v.c.qty}
+        if from_reserved:
+            new_values["reserved"] = func.greatest(Product.reserved - v.c.qty, 0)
+            available = Product.stock >= v.c.qty
+        else:
+            available = Product.stock - Product.reserved >= v.c.qty
+        matched = db.execute(
+            update(Product)
+            .where(Product.id == v.c.product_id, available)
+            .values(**new_values)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        if len(matched) != len(quantities):
+            logger.warning(
+                "InventoryRepository.deduct: short on products=%s",
+                sorted(set(quantities) - set(matched)),
+            )
+            return False
+        return True
+
+    @staticmethod
+    def convert(db: Session, order_id: int) -> Optional[bool]:
+        """
+        Turns an order's active holds into a real stock decrement.
+        Returns None when the order has no active holds (e.g. they expired),
+        otherwise the result of deduct().
+        """
+        quantities = InventoryRepository._take_holds(
+            db, order_id, ReservationStatus.CONVERTED
+        )
+        if not quantities:
+            return None
+        logger.info(
+            "InventoryRepository.convert: order_id=%s products=%d",
+            order_id,
+            len(quantities),
+        )
+        return InventoryRepository.deduct(db, quantities, from_reserved=True)
+
+    @staticmethod
+    def release(db: Session, order_id: int) -> int:
+        """Returns an order's active holds to available stock"""
+        quantities = InventoryRepository._take_holds(
+            db, order_id, ReservationStatus.RELEASED
+        )
+        InventoryRepository._unreserve(db, quantities)
+        logger.info(
+            "InventoryRepository.release: order_id=%s products=%d",
+            order_id,
+            len(quantities),
+        )
+        return len(quantities)
+
+    @staticmethod
+    def release_expired(db: Session, batch_size: int) -> List:
+        """
+        Releases up to `batch_size` expired holds, returned as
+        (order_id, expires_at) rows. SKIP LOCKED lets several sweepers
+        (one per worker process) share the backlog.
+        """
+        expired = (
+            select(StockReservation.id)
+            .where(
+                StockReservation.status == ReservationStatus.HELD,
+                StockReservation.expires_at < func.now(),
+            )
+            .order_by(StockReservation.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            update(StockReservation)
+            .where(StockReservation.id.in_(expired))
+            .values(status=ReservationStatus.RELEASED)
+            .returning(
+                StockReservation.order_id,
+                StockReservation.expires_at,
+                StockReservation.product_id,
+                StockReservation.quantity,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        InventoryRepository._unreserve(
+            db, _sum_by_product((product_id, qty) for _, _, product_id, qty in rows)
+        )
+        return [(order_id, expires_at) for order_id, expires_at, _, _ in rows]
+
+    @staticmethod
+    def _unreserve(db: Session, quantities: Dict[int, int]):
+        if not quantities:
+            return
+        v = _quantities_table(quantities)
+        db.execute(
+            update(Product)
+            .where(Product.id == v.c.product_id)
+            .values(reserved=func.greatest(Product.reserved - v.c.qty, 0))
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,83 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import select, func, tuple_, and_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.orm import Session
+from app.models.orders import Order, OrderItem
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError on anything we didn't issue"""
+    created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+class OrderRepository:
+    @staticmethod
+    def list_order_summaries(
+        db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of a user's order history, newest first, keyset-paginated on
+        (created_at, id). Summaries are built in a single grouped query over
+        just the page's orders (served by ix_orders_user_id_created_at).
+        """
+        page = select(
+            Order.id,
+            Order.total_amount,
+            Order.order_status,
+            Order.payment_status,
+            Order.created_at,
+        ).where(Order.user_id == user_id)
+        if cursor:
+            created_at, order_id = decode_cursor(cursor)
+            page = page.where(tuple_(Order.created_at, Order.id) < (created_at, order_id))
+        page = (
+            page.order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(limit + 1)
+            .subquery()
+        )
+
+        rows = db.execute(
+            select(
+                page,
+                func.count(OrderItem.id).label("item_count"),
+                array_agg(
+                    aggregate_order_by(OrderItem.product_name_snapshot, OrderItem.id)
+                )[1].label("first_item_name"),
+            )
+            .select_from(page)
+            .outerjoin(
+                OrderItem,
+                and_(
+                    OrderItem.order_id == page.c.id,
+                    # Items never predate the page's oldest order: lets Postgres
+                    # skip older order_items partitions at run time
+                    OrderItem.created_at
+                    >= select(func.min(page.c.created_at)).scalar_subquery(),
+                ),
+            )
+            .group_by(*page.c)
+            .order_by(page.c.created_at.desc(), page.c.id.desc())
+        ).mappings().all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        logger.info(
+            "OrderRepository.list_order_summaries: user_id=%s returned=%d more=%s",
+            user_id,
+            len(rows),
+            next_cursor is not None,
+        )
+        return [dict(r) for r in rows], next_cursor
@@ -0,0 +1,125 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Collection, List, Optional
+from sqlalchemy import update, select, or_, and_, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.outbox import OutboxEvent, OutboxStatus
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class OutboxRepository:
+    @staticmethod
+    def enqueue(
+        db: Session, kind: str, payload: dict, delay_seconds: int = 0
+    ) -> OutboxEvent:
+        """Adds an event to the caller's transaction (no commit)"""
+        event = OutboxEvent(kind=kind, payload=payload, status=OutboxStatus.PENDING)
+        if delay_seconds:
+            event.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+                seconds=delay_seconds
+            )
+        db.add(event)
+        db.flush()
+        return event
+
+    @staticmethod
+    def claim_batch(
+        db: Session,
+        batch_size: int,
+        lease_seconds: int,
+        kinds: Optional[Collection[str]] = None,
+        exclude_kinds: Optional[Collection[str]] = None,
+    ) -> List:
+        """
+        Leases up to `batch_size` due events as (id, kind, payload, attempts)
+        rows. SKIP LOCKED keeps concurrent workers off each other's rows; an
+        expired lease (crashed worker) makes a PROCESSING row claimable again.
+        `kinds` / `exclude_kinds` restrict the claim to one worker lane.
+        Caller commits to publish the lease.
+        """
+        due = select(OutboxEvent.id).where(
+            or_(
+                and_(
+                    OutboxEvent.status == OutboxStatus.PENDING,
+                    OutboxEvent.next_attempt_at <= func.now(),
+                ),
+                and_(
+                    OutboxEvent.status == OutboxStatus.PROCESSING,
+                    OutboxEvent.locked_until < func.now(),
+                ),
+            )
+        )
+        if kinds:
+            due = due.where(OutboxEvent.kind.in_(kinds))
+        if exclude_kinds:
+            due = due.where(OutboxEvent.kind.not_in(exclude_kinds))
+        due = (
+            due.order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(due))
+            .values(
+                status=OutboxStatus.PROCESSING,
+                attempts=OutboxEvent.attempts + 1,
+                locked_until=func.now() + timedelta(seconds=lease_seconds),
+            )
+            .returning(
+                OutboxEvent.id,
+                OutboxEvent.kind,
+                OutboxEvent.payload,
+                OutboxEvent.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    @staticmethod
+    def mark_done(db: Session, event_id: int):
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id)
+            .values(status=OutboxStatus.DONE, locked_until=None, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def mark_retry(db: Session, event_id: int, attempts: int, error: str) -> bool:
+        """
+        Schedules another delivery with exponential backoff and jitter.
+        Returns False, leaving the event untouched, once attempts are exhausted.
+        """
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            return False
+        delay = min(
+            settings.OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)),
+            settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        )
+        delay *= random.uniform(0.5, 1.0)
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id)
+            .values(
+                status=OutboxStatus.PENDING,
+                locked_until=None,
+                last_error=error[:2000],
+                next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    @staticmethod
+    def mark_failed(db: Session, event_id: int, error: str):
+        logger.error("OutboxRepository.mark_failed: event_id=%s error=%s", event_id, error)
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id)
+            .values(status=OutboxStatus.FAILED, locked_until=None, last_error=error[:2000])
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.orders import PaymentGatewayPayload
+from app.utils.compression import compress_json, decompress_json
+
+
+class PaymentPayloadRepository:
+    """Compressed raw gateway responses, one or more per PaymentAttempt"""
+
+    @staticmethod
+    def store(db: Session, attempt_id: int, payload) -> None:
+        """Adds to the caller's transaction; a no-op when storage is disabled"""
+        if settings.PAYMENT_PAYLOAD_STORAGE != "compressed":
+            return
+        codec, blob = compress_json(payload)
+        db.add(PaymentGatewayPayload(attempt_id=attempt_id, codec=codec, payload=blob))
+
+    @staticmethod
+    def latest(db: Session, attempt_id: int) -> Optional[dict]:
+        row = db.execute(
+            select(PaymentGatewayPayload.codec, PaymentGatewayPayload.payload)
+            .where(PaymentGatewayPayload.attempt_id == attempt_id)
+            .order_by(PaymentGatewayPayload.id.desc())
+            .limit(1)
+        ).first()
+        return decompress_json(row.codec, row.payload) if row else None
+
+    @staticmethod
+    def prune(db: Session, older_than: datetime, batch_size: int) -> int:
+        doomed = (
+            select(PaymentGatewayPayload.id)
+            .where(PaymentGatewayPayload.created_at < older_than)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        return db.execute(
+            delete(PaymentGatewayPayload)
+            .where(PaymentGatewayPayload.id.in_(doomed))
+            .execution_options(synchronize_session=False)
+        ).rowcount
@@ -17,15 +17,17 @@ class ProductRepository:
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         search_query: Optional[str] = None,
+        in_stock: bool = False,
     ):
         logger.info(
-            "ProductRepository.search_products: brand=%s ram=%s network=%s min_price=%s max_price=%s query=%s",
+            "ProductRepository.search_products: brand=%s ram=%s network=%s min_price=%s max_price=%s query=%s in_stock=%s",
             brand,
             ram,
             network_type,
             min_price,
             max_price,
             search_query,
+            in_stock,
         )
         query = db.query(Product).filter(Product.is_active == True)
 
@@ -40,6 +42,9 @@ class ProductRepository:
         if max_price is not None:
             query = query.filter(Product.price <= max_price)
 
+        if in_stock:
+            query = query.filter(Product.available_stock > 0)
+
         # Simple Search on Model Name
         if search_query:
             query = query.filter(Product.model_name.ilike(f"%{search_query}%"))
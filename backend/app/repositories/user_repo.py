@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session, joinedload
 from app.models.user import User, Profile, Address
 from app.schemas.user import UserCreate, AddressCreate
-from app.utils.log_config import logger
+from app.repositories.image_repo import ImageObjectRepository
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
 
 
 class UserRepository:
@@ -85,7 +88,9 @@ class UserRepository:
 
         if "gender" in update_data:
             profile.gender = update_data["gender"]
-        if "pic_url" in update_data:
+        if "pic_url" in update_data and update_data["pic_url"] != profile.profile_picture:
+            ImageObjectRepository.release(db, profile.profile_picture)
+            ImageObjectRepository.acquire(db, update_data["pic_url"])
             profile.profile_picture = update_data["pic_url"]
 
         db.commit()
@@ -0,0 +1,159 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import update, select, delete, or_, and_, func, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.models.webhooks import WebhookEvent, WebhookEventStatus
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+_UNFINISHED = (WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING)
+
+
+class WebhookRepository:
+    @staticmethod
+    def ingest(
+        db: Session, event_id: str, event_type: str, intent_id: Optional[str], payload: dict
+    ) -> bool:
+        """Stores a verified event. Returns False if Stripe already delivered it"""
+        inserted = db.execute(
+            pg_insert(WebhookEvent)
+            .values(
+                event_id=event_id,
+                event_type=event_type,
+                intent_id=intent_id,
+                payload=payload,
+                status=WebhookEventStatus.PENDING,
+                attempts=0,
+            )
+            .on_conflict_do_nothing(index_elements=["event_id"])
+            .returning(WebhookEvent.id)
+        ).first()
+        return inserted is not None
+
+    @staticmethod
+    def claim_batch(db: Session, batch_size: int, lease_seconds: int) -> List:
+        """
+        Leases due events as (id, event_type, intent_id, payload, attempts, created_at)
+        rows. Only the oldest unfinished event of each payment intent is
+        eligible, so per-intent order holds across any number of workers.
+        """
+        earlier = aliased(WebhookEvent)
+        blocked = exists().where(
+            earlier.intent_id == WebhookEvent.intent_id,
+            earlier.id < WebhookEvent.id,
+            earlier.status.in_(_UNFINISHED),
+        )
+        due = (
+            select(WebhookEvent.id)
+            .where(
+                or_(
+                    and_(
+                        WebhookEvent.status == WebhookEventStatus.PENDING,
+                        or_(
+                            WebhookEvent.next_attempt_at.is_(None),
+                            WebhookEvent.next_attempt_at <= func.now(),
+                        ),
+                    ),
+                    and_(
+                        WebhookEvent.status == WebhookEventStatus.PROCESSING,
+                        WebhookEvent.locked_until < func.now(),
+                    ),
+                ),
+                ~blocked,
+            )
+            .order_by(WebhookEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(due))
+            .values(
+                status=WebhookEventStatus.PROCESSING,
+                attempts=WebhookEvent.attempts + 1,
+                locked_until=func.now() + timedelta(seconds=lease_seconds),
+            )
+            .returning(
+                WebhookEvent.id,
+                WebhookEvent.event_type,
+                WebhookEvent.intent_id,
+                WebhookEvent.payload,
+                WebhookEvent.attempts,
+                WebhookEvent.created_at,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    @staticmethod
+    def mark_done(db: Session, row_id: int):
+        db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id == row_id)
+            .values(
+                status=WebhookEventStatus.DONE,
+                locked_until=None,
+                last_error=None,
+                processed_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def mark_retry(db: Session, row_id: int, attempts: int, error: str):
+        """Backs off, or gives up (FAILED) once WEBHOOK_MAX_ATTEMPTS is reached"""
+        if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            logger.error(
+                "WebhookRepository.mark_retry: giving up row_id=%s error=%s", row_id, error
+            )
+            values = {"status": WebhookEventStatus.FAILED, "processed_at": func.now()}
+        else:
+            delay = min(
+                settings.WEBHOOK_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)),
+                settings.WEBHOOK_BACKOFF_MAX_SECONDS,
+            ) * random.uniform(0.5, 1.0)
+            values = {
+                "status": WebhookEventStatus.PENDING,
+                "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+            }
+        db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id == row_id)
+            .values(locked_until=None, last_error=error[:2000], **values)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def queue_stats(db: Session) -> dict:
+        """Depth and age of the unprocessed backlog"""
+        depth, oldest = db.execute(
+            select(func.count(WebhookEvent.id), func.min(WebhookEvent.created_at)).where(
+                WebhookEvent.status.in_(_UNFINISHED)
+            )
+        ).one()
+        lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+        return {"depth": depth, "oldest_lag_seconds": round(lag, 3)}
+
+    @staticmethod
+    def prune(db: Session, older_than: datetime, batch_size: int) -> int:
+        """Deletes one batch of finished events received before `older_than`"""
+        doomed = (
+            select(WebhookEvent.id)
+            .where(
+                WebhookEvent.status.in_(
+                    (WebhookEventStatus.DONE, WebhookEventStatus.FAILED)
+                ),
+                WebhookEvent.created_at < older_than,
+            )
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        return db.execute(
+            delete(WebhookEvent)
+            .where(WebhookEvent.id.in_(doomed))
+            .execution_options(synchronize_session=False)
+        ).rowcount
@@ -25,7 +25,12 @@ def get_cart(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     logger.info("Get cart: user_id=%s", current_user.id)
-    return EcommerceRepository.get_or_create_active_cart(db, current_user.id)
+    cart = EcommerceRepository.get_or_create_active_cart(db, current_user.id)
+    # Pick up catalog price changes since the items were added
+    if EcommerceRepository.reprice_cart(db, cart.id):
+        db.commit()
+        db.refresh(cart)
+    return cart
 
 
 @router.post("/cart/add", response_model=CartResponse)
@@ -56,6 +61,7 @@ def add_to_cart(
 
     if cart_item:
         cart_item.quantity += item_in.quantity
+        cart_item.price_changed = False
     else:
         cart_item = CartItem(
             cart_id=cart.id,
@@ -154,13 +160,14 @@ def update_cart_item_quantity(
         raise HTTPException(status_code=404, detail="Item not found in cart")
 
     # 2. Re-verify Stock at DB level (Security check)
-    if item.product.stock < item_update.quantity:
+    if item.product.available_stock < item_update.quantity:
         raise HTTPException(
             status_code=400, detail="Requested quantity exceeds available stock"
         )
 
     # 3. Update quantity
     item.quantity = item_update.quantity
+    item.price_changed = False
     db.commit()
 
     # 4. Recalculate Cart Total
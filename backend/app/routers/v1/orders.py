@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, Body, Header, HTTPException
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Body, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.routers.deps import get_current_user
 from app.services.order_service import OrderService
+from app.repositories.order_repo import OrderRepository
+from app.services.payment_service import PaymentService
+from app.services.idempotency_service import IdempotencyService, request_fingerprint
+from app.services.order_events import order_events, RESYNC
+from app.services.admission_service import FlashSaleAdmission
+from app.models.orders import (
+    Order,
+    OrderItem,
+    OrderStatus,
+    PaymentAttempt,
+    PaymentAttemptStatus,
+)
 from app.schemas.orders import (
     CheckoutRequest,
     OrderResponse,
+    OrderHistoryPage,
 )  # Schema: {address_id: int, cart_item_ids: list[int]}
 
 router = APIRouter()
@@ -14,10 +32,26 @@ router = APIRouter()
 
 @router.post("/checkout")
 async def initiate_checkout(
-    req: CheckoutRequest, db: Session = Depends(get_db), user=Depends(get_current_user)
+    req: CheckoutRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
-    return await OrderService.initiate_checkout(
-        db, user, req.address_id, req.cart_item_ids
+    """
+    Send an Idempotency-Key header to make retries safe: the first response
+    is replayed to any repeat of the same request.
+    """
+
+    async def checkout():
+        async with FlashSaleAdmission.admit(user.id, req.cart_item_ids):
+            return await OrderService.initiate_checkout(
+                db, user, req.address_id, req.cart_item_ids
+            )
+
+    if not idempotency_key:
+        return await checkout()
+    return await IdempotencyService.run(
+        user.id, idempotency_key, request_fingerprint(req.model_dump()), checkout
     )
 
 
@@ -48,15 +82,108 @@ async def payment_webhook(
     return {"message": "Order Confirmed and Stock Adjusted"}
 
 
-@router.get("/my-orders")
-def get_my_orders(user=Depends(get_current_user), db: Session = Depends(get_db)):
-    from app.models.orders import Order
+@router.get("/my-orders", response_model=OrderHistoryPage)
+def get_my_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        items, next_cursor = OrderRepository.list_order_summaries(
+            db, user.id, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
 
-    return (
-        db.query(Order)
-        .filter_by(user_id=user.id)
-        .order_by(Order.created_at.desc())
-        .all()
+
+@router.get("/{order_id}/payment")
+def get_order_payment(
+    order_id: int, current_user=Depends(get_current_user), db: Session = Depends(get_db)
+):
+    """
+    Client secret for an order whose intent was created by the outbox worker.
+    Returns 202 while the intent is still pending.
+    """
+    order = _get_user_order(db, order_id, current_user.id)
+    attempt = (
+        db.query(PaymentAttempt)
+        .filter(
+            PaymentAttempt.order_id == order.id,
+            # Attempts never predate their order: skips older partitions
+            PaymentAttempt.created_at >= order.created_at,
+        )
+        .order_by(PaymentAttempt.id.desc())
+        .first()
+    )
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    client_secret = PaymentService.client_secret_for(attempt)
+    if attempt.status == PaymentAttemptStatus.INITIATED or (
+        attempt.status == PaymentAttemptStatus.PROCESSING and not client_secret
+    ):
+        return JSONResponse(status_code=202, content={"payment_status": "pending"})
+    return {
+        "order_id": order_id,
+        "client_secret": client_secret,
+        "external_order_id": attempt.external_order_id,
+        "payment_status": attempt.status.value,
+    }
+
+
+@router.get("/{order_id}/events")
+async def stream_order_events(
+    order_id: int,
+    request: Request,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Server-Sent Events: the current order/payment status, then every change
+    until the order leaves `initiated`. Replaces polling GET /orders/{id}.
+    """
+    queue = order_events.subscribe(order_id)  # Before the read, so no change slips between
+    try:
+        snapshot = await asyncio.to_thread(_order_snapshot, db, order_id, current_user.id)
+    except Exception:
+        order_events.unsubscribe(order_id, queue)
+        raise
+    finally:
+        db.close()  # Don't hold a pooled connection for the life of the stream
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.ORDER_EVENTS_MAX_STREAM_SECONDS
+        event = snapshot
+        try:
+            while True:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+                if event["order_status"] != OrderStatus.INITIATED.value:
+                    return
+                while True:
+                    try:
+                        event = await asyncio.wait_for(
+                            queue.get(), settings.ORDER_EVENTS_HEARTBEAT_SECONDS
+                        )
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected() or loop.time() > deadline:
+                            return
+                        yield ": keep-alive\n\n"
+                        continue
+                    if event is RESYNC:
+                        event = await asyncio.to_thread(
+                            _fresh_order_snapshot, order_id, current_user.id
+                        )
+                    break
+        finally:
+            order_events.unsubscribe(order_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -64,11 +191,42 @@ def get_my_orders(user=Depends(get_current_user), db: Session = Depends(get_db))
 def get_order_details(
     order_id: int, current_user=Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    from app.models.orders import Order
+    order = _get_user_order(db, order_id, current_user.id)
+    items = (
+        db.query(OrderItem)
+        .filter(
+            OrderItem.order_id == order.id,
+            # Items are written with their order: skips older partitions
+            OrderItem.created_at >= order.created_at,
+        )
+        .order_by(OrderItem.id)
+        .all()
+    )
+    set_committed_value(order, "order_items", items)
+    return order
+
+
+def _order_snapshot(db: Session, order_id: int, user_id: int) -> dict:
+    order = _get_user_order(db, order_id, user_id)
+    return {
+        "order_id": order.id,
+        "order_status": order.order_status.value,
+        "payment_status": order.payment_status.value if order.payment_status else None,
+    }
+
+
+def _fresh_order_snapshot(order_id: int, user_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        return _order_snapshot(db, order_id, user_id)
+    finally:
+        db.close()
+
 
+def _get_user_order(db: Session, order_id: int, user_id: int):
     order = (
         db.query(Order)
-        .filter(Order.id == order_id, Order.user_id == current_user.id)
+        .filter(Order.id == order_id, Order.user_id == user_id)
         .first()
     )
     if not order:
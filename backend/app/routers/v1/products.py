@@ -3,11 +3,21 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.routers.deps import get_current_active_seller
 from app.services.s3_service import S3Service
+from app.services.image_service import ImageService
 from app.models.user import User
 from app.models.product import Product
 from app.schemas.product import ProductResponse
 from app.repositories.product_repo import ProductRepository
-from app.schemas.product import FilterOptionsResponse, ProductResponse
+from app.repositories.ecommerce_repo import EcommerceRepository
+from app.repositories.image_repo import ImageObjectRepository
+from app.schemas.product import (
+    FilterOptionsResponse,
+    ProductResponse,
+    ProductPriceUpdate,
+    ProductFlashSaleUpdate,
+    ProductCreateFromUpload,
+)
+from app.schemas.upload import ImageUploadRequest, PresignedUpload
 from app.utils.log_config import logger
 from typing import List, Optional
 
@@ -35,7 +45,7 @@ async def add_mobile(
 ):
     logger.info("Adding product: brand=%s model=%s seller_id=%s", brand, model_name, current_seller.id)
     # 1. Upload to S3
-    image_url = S3Service.upload_image(image)
+    image_url = await S3Service.upload_image_async(image)
 
     # 2. Create Product Record
     new_product = Product(
@@ -55,6 +65,51 @@ async def add_mobile(
     )
 
     db.add(new_product)
+    db.flush()
+    ImageObjectRepository.acquire(db, new_product.image_url)
+    ImageService.request_variants(db, new_product)
+    db.commit()
+    db.refresh(new_product)
+    logger.info("Product added successfully: id=%s", new_product.id)
+    return new_product
+
+
+@router.post("/image-upload", response_model=PresignedUpload)
+def create_product_image_upload(
+    data: ImageUploadRequest,
+    current_seller: User = Depends(get_current_active_seller),
+):
+    """Step 1 of a direct upload: the browser POSTs the image straight to S3"""
+    logger.info("Product image upload requested: seller_id=%s", current_seller.id)
+    return S3Service.create_image_upload("products", current_seller.id, data.content_type)
+
+
+@router.post(
+    "/add/confirm", response_model=ProductResponse, status_code=status.HTTP_201_CREATED
+)
+def add_mobile_from_upload(
+    data: ProductCreateFromUpload,
+    current_seller: User = Depends(get_current_active_seller),
+    db: Session = Depends(get_db),
+):
+    """Step 2: verifies the uploaded image exists, then creates the product"""
+    logger.info(
+        "Adding product from upload: brand=%s model=%s seller_id=%s",
+        data.brand,
+        data.model_name,
+        current_seller.id,
+    )
+    image_url = S3Service.confirm_image_upload("products", current_seller.id, data.image_key)
+
+    new_product = Product(
+        **data.model_dump(exclude={"image_key"}),
+        image_url=image_url,
+        seller_id=current_seller.id,
+    )
+    db.add(new_product)
+    db.flush()
+    ImageObjectRepository.acquire(db, new_product.image_url)
+    ImageService.request_variants(db, new_product)
     db.commit()
     db.refresh(new_product)
     logger.info("Product added successfully: id=%s", new_product.id)
@@ -69,11 +124,14 @@ def search_mobiles(
     min_p: Optional[float] = None,
     max_p: Optional[float] = None,
     q: Optional[str] = None,
+    in_stock: bool = False,
     db: Session = Depends(get_db),
 ):
     """The main endpoint for the Home Page and Search Bar"""
     logger.info("Product search: brand=%s ram=%s network=%s min_p=%s max_p=%s q=%s", brand, ram, network, min_p, max_p, q)
-    results = ProductRepository.search_products(db, brand, ram, network, min_p, max_p, q)
+    results = ProductRepository.search_products(
+        db, brand, ram, network, min_p, max_p, q, in_stock=in_stock
+    )
     logger.info("Product search returned %d results", len(results))
     return results
 
@@ -97,6 +155,66 @@ def get_seller_inventory(
     return items
 
 
+@router.put("/{product_id}/price", response_model=ProductResponse)
+def update_product_price(
+    product_id: int,
+    data: ProductPriceUpdate,
+    current_seller: User = Depends(get_current_active_seller),
+    db: Session = Depends(get_db),
+):
+    """Changes a listing's price and re-prices every active cart holding it"""
+    logger.info(
+        "Update price: product_id=%s seller_id=%s price=%s",
+        product_id,
+        current_seller.id,
+        data.price,
+    )
+    product = (
+        db.query(Product)
+        .filter(Product.id == product_id, Product.seller_id == current_seller.id)
+        .first()
+    )
+    if not product:
+        logger.warning("Product not found for seller: product_id=%s", product_id)
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    product.price = data.price
+    db.flush()
+    EcommerceRepository.reprice_carts_for_product(db, product_id)
+    db.commit()
+    db.refresh(product)
+    return product
+
+
+@router.put("/{product_id}/flash-sale", response_model=ProductResponse)
+def set_flash_sale(
+    product_id: int,
+    data: ProductFlashSaleUpdate,
+    current_seller: User = Depends(get_current_active_seller),
+    db: Session = Depends(get_db),
+):
+    """Turns hot-product checkout admission on or off for a listing"""
+    logger.info(
+        "Set flash sale: product_id=%s seller_id=%s enabled=%s",
+        product_id,
+        current_seller.id,
+        data.enabled,
+    )
+    product = (
+        db.query(Product)
+        .filter(Product.id == product_id, Product.seller_id == current_seller.id)
+        .first()
+    )
+    if not product:
+        logger.warning("Product not found for seller: product_id=%s", product_id)
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    product.flash_sale = data.enabled
+    db.commit()
+    db.refresh(product)
+    return product
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 def get_product_details(product_id: int, db: Session = Depends(get_db)):
     """Retrieve a single mobile's details"""
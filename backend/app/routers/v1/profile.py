@@ -9,6 +9,7 @@ from app.schemas.user import (
     AddressCreate,
     AddressResponse,
 )
+from app.schemas.upload import ImageUploadRequest, PresignedUpload, ImageUploadConfirm
 from app.services.s3_service import S3Service
 from app.repositories.user_repo import UserRepository
 from app.utils.log_config import logger
@@ -86,7 +87,9 @@ async def upload_profile_pic(
     db: Session = Depends(get_db),
 ):
     logger.info("Upload profile picture: user_id=%s", current_user.id)
-    img_url = S3Service.upload_image(image, max_file_size=5)
+    img_url = await S3Service.upload_image_async(
+        image, max_file_size=5, prefix="profiles"
+    )
     data = {"pic_url": img_url}
     print("data", data)
     UserRepository.update_user_and_profile(db, current_user.id, update_data=data)
@@ -94,6 +97,31 @@ async def upload_profile_pic(
     return {"url": img_url}
 
 
+@router.post("/profile/picture/upload-url", response_model=PresignedUpload)
+def create_profile_pic_upload(
+    data: ImageUploadRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """Step 1 of a direct upload: the browser POSTs the image straight to S3"""
+    logger.info("Profile picture upload requested: user_id=%s", current_user.id)
+    return S3Service.create_image_upload("profiles", current_user.id, data.content_type)
+
+
+@router.put("/profile/picture/confirm")
+def confirm_profile_pic_upload(
+    data: ImageUploadConfirm,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Step 2: verifies the uploaded image exists, then sets it on the profile"""
+    img_url = S3Service.confirm_image_upload("profiles", current_user.id, data.key)
+    UserRepository.update_user_and_profile(
+        db, current_user.id, update_data={"pic_url": img_url}
+    )
+    logger.info("Profile picture updated: user_id=%s", current_user.id)
+    return {"url": img_url}
+
+
 # --- Address Management ---
 
 
@@ -1,26 +1,53 @@
+import asyncio
+import json
 import stripe
-import logging
 from fastapi import APIRouter, Request, Header, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.db.session import get_db
-from app.services.order_service import OrderService
+from app.db.session import get_db, SessionLocal
+from app.repositories.webhook_repo import WebhookRepository
+from app.routers.deps import get_current_active_admin
+from app.utils.lru import LRUCache
+from app.workers import webhook_worker
+from app.utils.log_config import get_logger
 
-logger = logging.getLogger("sellphone.webhooks")
+logger = get_logger(__name__)
 router = APIRouter()
 
 # Official Stripe Secret Key
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+# Recently stored event ids: redeliveries are acked without a DB round trip.
+# webhook_events.event_id (unique) stays the source of truth.
+seen_events = LRUCache(settings.WEBHOOK_DEDUP_CACHE_SIZE)
+
+
+def _store_event(raw: bytes) -> bool:
+    event = json.loads(raw)  # Already verified; keep Stripe's payload as sent
+    obj = event["data"]["object"]
+    intent_id = obj.get("id") if obj.get("object") == "payment_intent" else None
+    db = SessionLocal()
+    try:
+        stored = WebhookRepository.ingest(
+            db, event["id"], event["type"], intent_id, event
+        )
+        db.commit()
+        return stored
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 
 @router.post("/stripe")
 async def handle_stripe_webhook(
     request: Request,
     stripe_signature: str = Header(None),
-    db: Session = Depends(get_db),
 ):
     """
     The Official Entry Point for Stripe signals.
+    Verifies and persists the event, then acks; webhook_worker does the work.
     """
     payload = await request.body()
 
@@ -33,24 +60,23 @@ async def handle_stripe_webhook(
         logger.error(f"Webhook Signature Verification Failed: {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # 2. Extract Data from Event
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent = event["data"]["object"]  # Stripe object
+    if event["id"] in seen_events:
+        logger.info(f"Duplicate webhook ignored: {event['id']}")
+        return {"status": "success"}
 
-        # This is the pi_... ID you saw in your logs
-        stripe_intent_id = payment_intent["id"]
+    # 2. Persist (deduplicated on Stripe's event id). A failure here returns
+    # 500 so Stripe redelivers.
+    stored = await asyncio.to_thread(_store_event, payload)
+    seen_events.set(event["id"])
+    if not stored:
+        logger.info(f"Duplicate webhook ignored: {event['id']}")
 
-        logger.info(f"💰 Webhook: Payment received for {stripe_intent_id}")
-
-        # 3. Trigger Fulfillment Logic
-        # We use the Stripe ID to find our PaymentAttempt record
-        success = OrderService.finalize_payment_success(db, stripe_intent_id)
-
-        if not success:
-            logger.error(f"Fulfillment failed for Stripe ID: {stripe_intent_id}")
+    return {"status": "success"}
 
-    elif event["type"] == "payment_intent.payment_failed":
-        payment_intent = event["data"]["object"]
-        OrderService.handle_payment_failure(db, payment_intent["id"])
 
-    return {"status": "success"}
+@router.get("/stripe/stats")
+def webhook_queue_stats(
+    db: Session = Depends(get_db), admin=Depends(get_current_active_admin)
+):
+    """Queue depth/lag for the Stripe ingestion queue"""
+    return {**WebhookRepository.queue_stats(db), **webhook_worker.stats}
@@ -18,6 +18,7 @@ class CartItemResponse(BaseModel):
     quantity: int
     product_name_snapshot: str
     price_at_addition: float
+    price_changed: bool = False
     # Optionally include full product details if it still exists
     product: Optional[ProductResponse] = None
 
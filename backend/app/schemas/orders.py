@@ -94,6 +94,24 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class OrderSummary(BaseModel):
+    """One row of the buyer's order history list"""
+
+    id: int
+    total_amount: float
+    order_status: OrderStatus
+    payment_status: PaymentAttemptStatus
+    created_at: datetime
+    item_count: int
+    first_item_name: Optional[str] = None
+
+
+class OrderHistoryPage(BaseModel):
+    items: List[OrderSummary]
+    # Pass back as ?cursor= for the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
 class CheckoutResponse(BaseModel):
     """
     The response sent back to React immediately after clicking "Place Order".
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 
 
 class ProductBase(BaseModel):
@@ -20,10 +20,25 @@ class ProductCreate(ProductBase):
     pass
 
 
+class ProductCreateFromUpload(ProductCreate):
+    image_key: str = Field(..., max_length=500)  # From POST /products/image-upload
+
+
+class ProductPriceUpdate(BaseModel):
+    price: float = Field(..., gt=0)
+
+
+class ProductFlashSaleUpdate(BaseModel):
+    enabled: bool
+
+
 class ProductResponse(ProductBase):
     id: int
     image_url: Optional[str]
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    available_stock: int = 0
     is_active: bool
+    flash_sale: bool = False
     seller_id: int
 
     class Config:
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+
+
+class ImageUploadRequest(BaseModel):
+    content_type: str = Field(..., examples=["image/jpeg"])
+
+
+class PresignedUpload(BaseModel):
+    """POST `fields` plus the file (last) as multipart/form-data to `url`"""
+
+    url: str
+    fields: dict[str, str]
+    key: str
+    expires_in: int
+
+
+class ImageUploadConfirm(BaseModel):
+    key: str = Field(..., max_length=500)
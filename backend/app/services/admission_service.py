@@ -0,0 +1,154 @@
+import asyncio
+from contextlib import asynccontextmanager, AsyncExitStack
+from fastapi import HTTPException, status
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ecommerce import Cart, CartItem
+from app.models.product import Product
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Budget:
+    """Admission state for one flash-sale product in this process"""
+
+    __slots__ = ("tokens", "in_flight", "gate")
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens  # Units still admissible
+        self.in_flight = 0  # Units admitted whose checkout hasn't finished
+        self.gate = asyncio.Semaphore(settings.FLASH_SALE_CONCURRENCY)
+
+
+# Flash-sale products by id, refreshed by run_flash_sale_refresher
+_budgets: dict[int, _Budget] = {}
+
+
+def _flash_sale_stock() -> dict[int, int]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Product.id, Product.available_stock).where(
+                Product.flash_sale.is_(True), Product.is_active.is_(True)
+            )
+        ).all()
+        return {product_id: available for product_id, available in rows}
+    finally:
+        db.close()
+
+
+def _holds_flash_sale(user_id: int, cart_item_ids: list[int]) -> bool:
+    """One EXISTS over the user's checked-out items (primary key) joined to flash-sale products"""
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(
+                select(CartItem.id)
+                .join(Cart, Cart.id == CartItem.cart_id)
+                .join(Product, Product.id == CartItem.product_id)
+                .where(
+                    CartItem.id.in_(cart_item_ids),
+                    Cart.user_id == user_id,
+                    Product.flash_sale.is_(True),
+                )
+                .exists()
+            )
+        ).scalar()
+    finally:
+        db.close()
+
+
+def _cart_quantities(
+    user_id: int, cart_item_ids: list[int], product_ids: list[int]
+) -> dict[int, int]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(CartItem.product_id, func.sum(CartItem.quantity))
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(
+                CartItem.id.in_(cart_item_ids),
+                Cart.user_id == user_id,
+                CartItem.product_id.in_(product_ids),
+            )
+            .group_by(CartItem.product_id)
+        ).all()
+        return {product_id: int(qty) for product_id, qty in rows}
+    finally:
+        db.close()
+
+
+class FlashSaleAdmission:
+    """
+    Front door for checkouts of flash-sale products. Each product has a
+    token budget equal to its available stock: requests beyond it fail
+    fast with 409, and at most FLASH_SALE_CONCURRENCY admitted checkouts
+    per product reach the products row lock at a time; the rest wait in
+    line. Budgets are per process and refreshed from the database, so
+    the reservation in initiate_checkout stays the authority on stock.
+    """
+
+    @staticmethod
+    async def refresh():
+        stock = await asyncio.to_thread(_flash_sale_stock)
+        for product_id in list(_budgets):
+            if product_id not in stock:
+                del _budgets[product_id]
+        for product_id, available in stock.items():
+            budget = _budgets.get(product_id)
+            if budget is None:
+                budget = _budgets[product_id] = _Budget(0)
+            budget.tokens = max(available - budget.in_flight, 0)
+
+    @staticmethod
+    @asynccontextmanager
+    async def admit(user_id: int, cart_item_ids: list[int]):
+        # Most checkouts hold no flash-sale product: a cheap EXISTS spares the cart lookup
+        if not _budgets or not await asyncio.to_thread(
+            _holds_flash_sale, user_id, cart_item_ids
+        ):
+            yield
+            return
+        quantities = await asyncio.to_thread(
+            _cart_quantities, user_id, cart_item_ids, list(_budgets)
+        )
+
+        taken = []
+        try:
+            for product_id, qty in sorted(quantities.items()):
+                budget = _budgets.get(product_id)
+                if budget is None:
+                    continue
+                if budget.tokens < qty:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Product {product_id} is sold out",
+                    )
+                budget.tokens -= qty
+                budget.in_flight += qty
+                taken.append((budget, qty))
+
+            async with AsyncExitStack() as gates:
+                for budget, _ in taken:  # Product-id order, like the row locks
+                    try:
+                        await asyncio.wait_for(
+                            budget.gate.acquire(), settings.FLASH_SALE_QUEUE_TIMEOUT_SECONDS
+                        )
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Flash-sale queue timed out for user {user_id}")
+                        raise HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Checkout queue is full, please retry",
+                        )
+                    gates.callback(budget.gate.release)
+                yield
+        except BaseException:
+            # Not checked out: hand the units back
+            for budget, qty in taken:
+                budget.tokens += qty
+            raise
+        finally:
+            for budget, qty in taken:
+                budget.in_flight -= qty
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+from fastapi import HTTPException
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.idempotency_repo import IdempotencyRepository
+from app.utils.lru import LRUCache
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Completed (request_hash, status_code, response, expires_at) by (user_id, key)
+_completed = LRUCache(settings.IDEMPOTENCY_CACHE_SIZE)
+# Requests running in this process; duplicates await the same future
+_inflight: dict = {}
+
+
+def request_fingerprint(body: dict) -> str:
+    canonical = json.dumps(body, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        result = fn(db, *args)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _ttl() -> timedelta:
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _remember(cache_key, request_hash: str, status_code: int, response, created_at: datetime):
+    entry = (request_hash, status_code, response, created_at + _ttl())
+    _completed.set(cache_key, entry)
+    return entry
+
+
+def _cached(cache_key):
+    """The cached outcome, unless the key's TTL has run out (same rule as the table)"""
+    entry = _completed.get(cache_key)
+    if entry and entry[3] <= datetime.now(timezone.utc):
+        _completed.pop(cache_key)
+        return None
+    return entry
+
+
+def _replay(entry, request_hash: str):
+    if entry is None:
+        # The original failed transiently and released the key
+        raise HTTPException(status_code=409, detail="Original request failed; retry.")
+    stored_hash, status_code, response = entry[:3]
+    if stored_hash != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request.",
+        )
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=response)
+    return response
+
+
+def _claim_or_load(db, user_id: int, key: str, request_hash: str):
+    """Returns None if we own the key now, else the existing record"""
+    if IdempotencyRepository.claim(db, user_id, key, request_hash):
+        return None
+    record = IdempotencyRepository.get(db, user_id, key)
+    now = datetime.now(timezone.utc)
+    if record and record["created_at"] < now - _ttl():
+        # Expired but not pruned yet: start over
+        IdempotencyRepository.release(db, user_id, key, only_pending=False)
+        if IdempotencyRepository.claim(db, user_id, key, request_hash):
+            return None
+        record = IdempotencyRepository.get(db, user_id, key)
+    if record and not record["completed"]:
+        # A claim whose worker died mid-request would otherwise block the key until its TTL
+        lease_start = now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_LEASE_SECONDS)
+        if record["claimed_at"] < lease_start and IdempotencyRepository.take_over(
+            db, user_id, key, request_hash, lease_start
+        ):
+            logger.warning(f"Idempotency-Key claim for user {user_id} was stale; taken over")
+            return None
+    return record
+
+
+class IdempotencyService:
+    @staticmethod
+    async def run(
+        user_id: int, key: str, request_hash: str, handler: Callable[[], Awaitable]
+    ):
+        """
+        Runs `handler` once per (user, Idempotency-Key) and replays its result
+        (success or 4xx) to every duplicate. Duplicates in this process await
+        the in-flight call; duplicates in other processes poll the table.
+        """
+        cache_key = (user_id, key)
+        entry = _cached(cache_key)
+        if entry:
+            return _replay(entry, request_hash)
+
+        inflight = _inflight.get(cache_key)
+        if inflight:
+            await asyncio.shield(inflight)
+            return _replay(_cached(cache_key), request_hash)
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight[cache_key] = future
+        try:
+            record = await asyncio.to_thread(
+                _with_session, _claim_or_load, user_id, key, request_hash
+            )
+            if record is not None:
+                return await IdempotencyService._await_other_process(
+                    user_id, key, request_hash, record
+                )
+            return await IdempotencyService._execute(
+                user_id, key, request_hash, handler
+            )
+        finally:
+            _inflight.pop(cache_key, None)
+            future.set_result(None)
+
+    @staticmethod
+    async def _execute(user_id: int, key: str, request_hash: str, handler):
+        cache_key = (user_id, key)
+        try:
+            response = await handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                # Transient: let the client retry with the same key
+                await asyncio.to_thread(
+                    _with_session, IdempotencyRepository.release, user_id, key
+                )
+                raise
+            await asyncio.to_thread(
+                _with_session,
+                IdempotencyRepository.complete,
+                user_id,
+                key,
+                e.status_code,
+                e.detail,
+            )
+            _remember(cache_key, request_hash, e.status_code, e.detail, datetime.now(timezone.utc))
+            raise
+        except BaseException:
+            await asyncio.to_thread(
+                _with_session, IdempotencyRepository.release, user_id, key
+            )
+            raise
+
+        await asyncio.to_thread(
+            _with_session, IdempotencyRepository.complete, user_id, key, 200, response
+        )
+        _remember(cache_key, request_hash, 200, response, datetime.now(timezone.utc))
+        return response
+
+    @staticmethod
+    async def _await_other_process(user_id: int, key: str, request_hash: str, record):
+        waited = 0.0
+        while not record["completed"]:
+            if waited >= settings.IDEMPOTENCY_WAIT_SECONDS:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress.",
+                )
+            await asyncio.sleep(0.2)
+            waited += 0.2
+            record = await asyncio.to_thread(
+                _with_session, IdempotencyRepository.get, user_id, key
+            )
+            if record is None:
+                return _replay(None, request_hash)
+        entry = _remember(
+            (user_id, key),
+            record["request_hash"],
+            record["status_code"],
+            record["response"],
+            record["created_at"],
+        )
+        return _replay(entry, request_hash)
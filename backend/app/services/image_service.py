@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.product import Product
+from app.repositories.outbox_repo import OutboxRepository
+from app.services.s3_service import S3Service
+from app.utils.images import ImageProcessingError, render_variants, variant_key
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+_process_pool = None
+
+
+def _pool() -> ProcessPoolExecutor:
+    """Created on first use; spawn, so workers don't inherit the app's threads"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+class ImageService:
+    """
+    Resized WebP/JPEG variants of product images, stored next to the
+    original. Generation runs from the outbox: download, render in a
+    process pool, upload, then Product.image_variants is set.
+    """
+
+    GENERATE_VARIANTS = "image.variants"
+
+    @staticmethod
+    def request_variants(db: Session, product: Product):
+        """Adds the job to the caller's transaction (no commit)"""
+        # Content-addressed images are shared: reuse variants already rendered
+        existing = (
+            db.query(Product.image_variants)
+            .filter(
+                Product.image_url == product.image_url,
+                Product.image_variants.isnot(None),
+            )
+            .first()
+        )
+        if existing:
+            product.image_variants = existing.image_variants
+            return
+        OutboxRepository.enqueue(
+            db,
+            ImageService.GENERATE_VARIANTS,
+            {"product_id": product.id, "image_url": product.image_url},
+        )
+
+    @staticmethod
+    async def generate_variants(payload: dict) -> dict:
+        """Returns {"<width>": {"webp": url, "jpg": url}}"""
+        file_key = S3Service.key_from_url(payload["image_url"])
+        if not file_key:
+            raise ImageProcessingError(f"No object key in {payload['image_url']}")
+        data = await S3Service.download_async(file_key)
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(
+            _pool(), render_variants, data, settings.IMAGE_VARIANT_WIDTHS
+        )
+        items = list(rendered.items())
+        urls = await asyncio.gather(
+            *(
+                S3Service.upload_bytes_async(
+                    variant_key(file_key, width, fmt), body, content_type
+                )
+                for (width, fmt), (body, content_type) in items
+            )
+        )
+        variants = {}
+        for ((width, fmt), _), url in zip(items, urls):
+            variants.setdefault(str(width), {})[fmt] = url
+        return variants
+
+    @staticmethod
+    def record_variants(db: Session, payload: dict, variants: dict):
+        product = db.get(Product, payload["product_id"])
+        # Skip if the product is gone or its image was replaced meanwhile
+        if product and product.image_url == payload["image_url"]:
+            product.image_variants = variants
+
+    @staticmethod
+    def record_variants_failure(db: Session, payload: dict, error: str):
+        """Products without variants fall back to the original image"""
+        logger.error(
+            f"Image variants abandoned for Product {payload['product_id']}: {error}"
+        )
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return not isinstance(error, ImageProcessingError)
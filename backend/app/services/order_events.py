@@ -0,0 +1,72 @@
+import asyncio
+import json
+from collections import defaultdict
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.orders import Order
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+RESYNC = {"resync": True}
+
+
+class OrderEventBus:
+    """
+    Order status changes for SSE subscribers. Writers publish with
+    pg_notify inside their own transaction, so only committed changes go
+    out; every app process LISTENs (app/workers/order_event_listener.py)
+    and dispatches to its local subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+
+    @staticmethod
+    def publish(db: Session, order: Order):
+        """Adds the notification to the caller's transaction (no commit)"""
+        event = {
+            "order_id": order.id,
+            "order_status": order.order_status.value,
+            "payment_status": order.payment_status.value if order.payment_status else None,
+        }
+        db.execute(select(func.pg_notify(settings.ORDER_EVENTS_CHANNEL, json.dumps(event))))
+
+    def subscribe(self, order_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=16)
+        self._subscribers[order_id].add(queue)
+        return queue
+
+    def unsubscribe(self, order_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(order_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[order_id]
+
+    def dispatch(self, payload: str):
+        """Runs on the event loop for each NOTIFY received"""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed order event: {payload!r}")
+            return
+        for queue in self._subscribers.get(event.get("order_id"), ()):
+            self._offer(queue, event)
+
+    def resync(self):
+        """Notifications may have been missed (listener reconnected): re-read state"""
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, RESYNC)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass  # Stalled client; it re-reads state on reconnect
+
+
+order_events = OrderEventBus()
@@ -1,5 +1,8 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import stripe
-import logging
+from sqlalchemy import insert, func
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.core.config import settings
@@ -13,12 +16,22 @@ from app.models.orders import (
 from app.models.ecommerce import Cart, CartItem
 from app.models.product import Product
 from app.models.user import Address
+from app.repositories.inventory_repo import InventoryRepository
+from app.repositories.outbox_repo import OutboxRepository
+from app.services.order_events import order_events
+from app.services.payment_service import PaymentService
+from app.utils.log_config import get_logger
 
-logger = logging.getLogger("sellphone.orders")
+logger = get_logger(__name__)
 
 # Initialize Stripe with your Secret Key
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+# An intent is created within the outbox's retry budget (well under a day)
+# after its attempt row; the slack above covers clock skew against Stripe
+INTENT_AFTER_ATTEMPT = timedelta(days=1)
+CLOCK_SKEW = timedelta(hours=1)
+
 
 class OrderService:
     @staticmethod
@@ -26,12 +39,73 @@ class OrderService:
         db: Session, user, address_id: int, cart_item_ids: list[int]
     ):
         """
-        DIRECT STRIPE VERSION:
-        1. Validates stock.
-        2. Creates Order/OrderItems.
-        3. Creates Stripe PaymentIntent.
-        4. Clears Cart only if Stripe succeeds.
+        DIRECT STRIPE VERSION, via the transactional outbox:
+        1. Validates stock, holds it and commits the Order as INITIATED
+           together with a "create payment intent" outbox event.
+        2. Creates the Stripe PaymentIntent off the event loop, keyed by an
+           idempotency key derived from the order.
+        3. Records the intent and clears the cart in a short transaction.
+        If step 2 or 3 fails (or PAYMENT_INTENT_INLINE is off) the outbox
+        worker finishes the job and the client picks up the client secret
+        from GET /orders/{id}/payment.
         """
+        # PHASE 1: local order + outbox event (sync DB work off the event loop)
+        payload = await asyncio.to_thread(
+            OrderService._create_pending_order, db, user, address_id, cart_item_ids
+        )
+        pending = {
+            "order_id": payload["order_id"],
+            "client_secret": None,
+            "external_order_id": None,
+            "payment_status": "pending",
+        }
+        if not settings.PAYMENT_INTENT_INLINE:
+            return pending
+
+        # PHASE 2: Stripe, outside any DB transaction
+        try:
+            intent = await PaymentService.create_intent(payload)
+        except stripe.error.StripeError as e:
+            logger.warning(
+                f"Stripe Error for Order {payload['order_id']}, deferring to outbox: {str(e)}"
+            )
+            return pending
+
+        # PHASE 3: record the intent
+        try:
+            await asyncio.to_thread(OrderService._complete_inline, db, payload, intent)
+        except Exception as e:
+            # The outbox event is still pending; the worker will attach the same intent
+            logger.error(
+                f"Could not record intent {intent.id} for Order {payload['order_id']}: {str(e)}",
+                exc_info=True,
+            )
+        logger.info(
+            f"Checkout initiated for Order {payload['order_id']}. Stripe Intent: {intent.id}"
+        )
+
+        return {
+            "order_id": payload["order_id"],
+            "client_secret": intent.client_secret,
+            "external_order_id": intent.id,
+            "payment_status": "processing",
+        }
+
+    @staticmethod
+    def _complete_inline(db: Session, payload: dict, intent):
+        try:
+            PaymentService.record_intent(db, payload, intent)
+            OutboxRepository.mark_done(db, payload["event_id"])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def _create_pending_order(
+        db: Session, user, address_id: int, cart_item_ids: list[int]
+    ) -> dict:
+        """Phase 1: validates, reserves stock and commits an INITIATED order"""
         try:
             # 1. VALIDATION
             items = db.query(CartItem).filter(CartItem.id.in_(cart_item_ids)).all()
@@ -44,10 +118,26 @@ class OrderService:
             if not address:
                 raise HTTPException(status_code=400, detail="Invalid address.")
 
-            # 2. PRE-CHECK STOCK
+            # 2. LOCK + CHECK STOCK
+            # One round trip for every product in the cart. Rows are locked in
+            # id order so concurrent checkouts sharing products can't deadlock.
+            product_ids = sorted({i.product_id for i in items if i.product_id})
+            products = {
+                p.id: p
+                for p in db.query(Product)
+                .filter(Product.id.in_(product_ids))
+                .order_by(Product.id)
+                .with_for_update()
+                .all()
+            }
+            quantities = {}
+            for item in items:
+                quantities[item.product_id] = (
+                    quantities.get(item.product_id, 0) + item.quantity
+                )
             for item in items:
-                product = db.query(Product).filter_by(id=item.product_id).first()
-                if not product or product.stock < item.quantity:
+                product = products.get(item.product_id)
+                if not product or product.available_stock < quantities[item.product_id]:
                     raise HTTPException(
                         status_code=400,
                         detail=f"Stock for {item.product_name_snapshot} is insufficient.",
@@ -60,59 +150,33 @@ class OrderService:
             db.add(order)
             db.flush()
 
-            for i in items:
-                db.add(
-                    OrderItem(
-                        order_id=order.id,
-                        product_id=i.product_id,
-                        quantity=i.quantity,
-                        product_name_snapshot=i.product_name_snapshot,
-                        price_per_unit=i.price_at_addition,
-                    )
-                )
-                db.delete(i)  # Prepare cart for clearing
-
-            # 4. DIRECT CALL TO STRIPE API
-            try:
-                # Stripe expects amount in cents (integer)
-                amount_in_cents = int(total * 100)
-
-                intent = stripe.PaymentIntent.create(
-                    amount=amount_in_cents,
-                    currency="usd",
-                    metadata={"order_id": order.id, "user_email": user.email},
-                    automatic_payment_methods={"enabled": True},
-                )
-            except stripe.error.StripeError as e:
-                logger.error(f"Stripe Error: {str(e)}")
-                raise HTTPException(
-                    status_code=502, detail="Could not initialize payment with Stripe."
-                )
-
-            # 5. CREATE ATTEMPT LOG
-            attempt = PaymentAttempt(
-                order_id=order.id,
-                external_order_id=intent.id,  # Stripe's ID (pi_...)
-                external_customer_id=f"CUST-{user.id}",
-                idempotency_key=intent.id,  # Use Stripe's ID to prevent duplicate processing
-                amount=total,
-                status=PaymentAttemptStatus.PROCESSING,
+            db.execute(
+                insert(OrderItem),
+                [
+                    {
+                        "order_id": order.id,
+                        "product_id": i.product_id,
+                        "quantity": i.quantity,
+                        "product_name_snapshot": i.product_name_snapshot,
+                        "price_per_unit": i.price_at_addition,
+                    }
+                    for i in items
+                ],
             )
-            db.add(attempt)
 
-            # Link Stripe session to order
-            order.payment_session_id = intent.id
+            # Hold the units until the webhook (or the TTL sweeper) settles them
+            if not InventoryRepository.reserve(db, order.id, quantities):
+                raise HTTPException(
+                    status_code=409, detail="Some items just sold out."
+                )
 
-            db.commit()  # Save everything
-            logger.info(
-                f"Checkout initiated for Order {order.id}. Stripe Intent: {intent.id}"
+            # 4. ATTEMPT LOG + OUTBOX EVENT (same transaction as the order)
+            payload = PaymentService.request_payment_intent(
+                db, order, user, cart_item_ids
             )
 
-            return {
-                "order_id": order.id,
-                "client_secret": intent.client_secret,
-                "external_order_id": intent.id,
-            }
+            db.commit()  # Short transaction: releases the product row locks
+            return payload
 
         except Exception as e:
             db.rollback()
@@ -122,16 +186,19 @@ class OrderService:
             raise HTTPException(status_code=500, detail="Transaction failed.")
 
     @staticmethod
-    def finalize_payment_success(db: Session, stripe_intent_id: str):
+    def finalize_payment_success(
+        db: Session, stripe_intent_id: str, intent_created: Optional[int] = None
+    ):
         """
         CORE FULFILLMENT LOGIC:
         Triggered by Webhook. Ensures stock deduction happens exactly once.
+        `intent_created` (Stripe's unix timestamp) bounds the partition scan.
         """
         try:
-            # 1. Find the Attempt
+            # 1. Find and Lock the Attempt (serializes duplicate deliveries)
             attempt = (
-                db.query(PaymentAttempt)
-                .filter_by(external_order_id=stripe_intent_id)
+                OrderService._attempt_query(db, stripe_intent_id, intent_created)
+                .with_for_update()
                 .first()
             )
             if not attempt:
@@ -143,25 +210,42 @@ class OrderService:
             if attempt.status == PaymentAttemptStatus.SUCCESS:
                 return True  # Idempotency: Already processed
 
-            # 2. Find and Lock the Order
-            order = db.query(Order).filter(Order.id == attempt.order_id).first()
+            # 2. Find the Order
+            order = OrderService._order_for(db, attempt)
 
             # 3. ATOMIC STOCK DEDUCTION
-            for item in order.order_items:
-                product = (
-                    db.query(Product)
-                    .filter(Product.id == item.product_id)
-                    .with_for_update()
-                    .first()
+            # One conditional UPDATE for the whole order, inside a savepoint so a
+            # partial match leaves no stock changes behind. Normally the checkout
+            # hold is converted; if it already expired we deduct from live stock.
+            savepoint = db.begin_nested()
+            deducted = InventoryRepository.convert(db, order.id)
+            if deducted is None:
+                deducted = InventoryRepository.deduct(
+                    db, OrderService._order_quantities(db, order.id)
                 )
-                if product:
-                    product.stock -= item.quantity
 
             # 4. UPDATE STATUSES
-            order.order_status = OrderStatus.CONFIRMED
+            # Only after the savepoint is resolved: a rollback expires and
+            # discards anything assigned while it was open.
+            if deducted:
+                savepoint.commit()
+                order.order_status = OrderStatus.CONFIRMED
+            else:
+                savepoint.rollback()
+                InventoryRepository.release(db, order.id)
+                order.order_status = OrderStatus.INSUFFICIENT_STOCK
+                PaymentService.request_refund(db, order, attempt)
+                logger.error(
+                    f"Order {order.id} paid via {stripe_intent_id} but stock is "
+                    "insufficient; refund queued"
+                )
+            # Paid either way: INSUFFICIENT_STOCK orders get the refund queued
+            # above, and the SUCCESS attempt stops redeliveries/reconcile from
+            # deducting (or refunding) again
             order.payment_status = PaymentAttemptStatus.SUCCESS
             attempt.status = PaymentAttemptStatus.SUCCESS
 
+            order_events.publish(db, order)
             db.commit()
             return True
         except Exception as e:
@@ -170,26 +254,136 @@ class OrderService:
             return False
 
     @staticmethod
-    def handle_payment_failure(db: Session, stripe_intent_id: str):
-        """Cancels the order record if payment is declined"""
-        attempt = (
-            db.query(PaymentAttempt)
-            .filter_by(external_order_id=stripe_intent_id)
+    def _attempt_query(
+        db: Session, stripe_intent_id: str, intent_created: Optional[int] = None
+    ):
+        """Attempts by Stripe ID, limited to the partitions the intent's creation time allows"""
+        query = db.query(PaymentAttempt).filter_by(external_order_id=stripe_intent_id)
+        if intent_created is not None:
+            created = datetime.fromtimestamp(intent_created, timezone.utc)
+            query = query.filter(
+                PaymentAttempt.created_at.between(
+                    created - INTENT_AFTER_ATTEMPT, created + CLOCK_SKEW
+                )
+            )
+        return query
+
+    @staticmethod
+    def _order_for(db: Session, attempt: PaymentAttempt) -> Optional[Order]:
+        """The attempt's order: written in the same transaction, so same created_at"""
+        return (
+            db.query(Order)
+            .filter(
+                Order.id == attempt.order_id,
+                Order.created_at.between(
+                    attempt.created_at - INTENT_AFTER_ATTEMPT, attempt.created_at
+                ),
+            )
             .first()
         )
-        if attempt:
-            order = db.query(Order).filter(Order.id == attempt.order_id).first()
-            if order:
-                order.order_status = OrderStatus.CANCELLED
-                order.payment_status = PaymentAttemptStatus.FAILED
-                attempt.status = PaymentAttemptStatus.FAILED
-                db.commit()
 
     @staticmethod
-    def process_payment_webhook(db: Session, external_order_id: str, success: bool):
+    def _order_quantities(db: Session, order_id: int) -> dict:
+        rows = (
+            db.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .filter(OrderItem.order_id == order_id, OrderItem.product_id.isnot(None))
+            .group_by(OrderItem.product_id)
+            .all()
+        )
+        return {product_id: int(qty) for product_id, qty in rows}
+
+    @staticmethod
+    def handle_payment_failure(
+        db: Session, stripe_intent_id: str, intent_created: Optional[int] = None
+    ):
+        """
+        Cancels the order record if payment is declined.
+        Returns False if no local attempt matches the Stripe ID.
+        """
+        attempt = OrderService._attempt_query(
+            db, stripe_intent_id, intent_created
+        ).first()
+        if not attempt:
+            return False
+        if attempt.status in (PaymentAttemptStatus.FAILED, PaymentAttemptStatus.SUCCESS):
+            return True  # Idempotency: already settled, nothing to write
+        order = OrderService._order_for(db, attempt)
+        if order:
+            order.order_status = OrderStatus.CANCELLED
+            order.payment_status = PaymentAttemptStatus.FAILED
+            attempt.status = PaymentAttemptStatus.FAILED
+            InventoryRepository.release(db, order.id)
+            order_events.publish(db, order)
+            db.commit()
+        return True
+
+    @staticmethod
+    def cancel_expired(db: Session, expired: list) -> int:
+        """
+        Cancels the still-INITIATED orders whose holds the sweeper just
+        released ((order_id, expires_at) rows), in the sweeper's transaction.
+        Orders locked by a webhook being applied are skipped: it settles them.
+        A payment that still arrives confirms the order from live stock.
+        """
+        if not expired:
+            return 0
+        # Holds are written with their order, RESERVATION_TTL_SECONDS before expiry
+        ttl = timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+        expiries = [expires_at for _, expires_at in expired]
+        orders = (
+            db.query(Order)
+            .filter(
+                Order.id.in_({order_id for order_id, _ in expired}),
+                Order.created_at.between(
+                    min(expiries) - ttl - CLOCK_SKEW, max(expiries) - ttl + CLOCK_SKEW
+                ),
+                Order.order_status == OrderStatus.INITIATED,
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for order in orders:
+            order.order_status = OrderStatus.CANCELLED
+            order_events.publish(db, order)
+        return len(orders)
+
+    @staticmethod
+    def apply_stripe_event(db: Session, event_type: str, payload: dict) -> bool:
+        """
+        Applies one stored Stripe event. Returns False when it should be
+        retried (e.g. the intent isn't attached to a local attempt yet).
+        Event types we don't act on are acknowledged as done.
+        """
+        intent = payload["data"]["object"]
+        if event_type == "payment_intent.succeeded":
+            stripe_intent_id = intent["id"]
+            logger.info(f"💰 Webhook: Payment received for {stripe_intent_id}")
+            success = OrderService.finalize_payment_success(
+                db, stripe_intent_id, intent.get("created")
+            )
+            if not success:
+                logger.error(f"Fulfillment failed for Stripe ID: {stripe_intent_id}")
+            return success
+
+        if event_type == "payment_intent.payment_failed":
+            return OrderService.handle_payment_failure(
+                db, intent["id"], intent.get("created")
+            )
+
+        return True
+
+    @staticmethod
+    def process_payment_webhook(
+        db: Session,
+        external_order_id: str,
+        success: bool,
+        intent_created: Optional[int] = None,
+    ):
         """Dispatches to the appropriate handler based on payment status."""
         if success:
-            return OrderService.finalize_payment_success(db, external_order_id)
+            return OrderService.finalize_payment_success(
+                db, external_order_id, intent_created
+            )
         else:
-            OrderService.handle_payment_failure(db, external_order_id)
+            OrderService.handle_payment_failure(db, external_order_id, intent_created)
             return True
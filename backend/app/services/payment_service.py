@@ -1,83 +1,181 @@
+from datetime import datetime
+from typing import Optional
 import stripe
-import uuid
-import logging
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.models.orders import PaymentAttempt, PaymentAttemptStatus
+from app.models.ecommerce import CartItem
+from app.models.orders import Order, OrderStatus, PaymentAttempt, PaymentAttemptStatus
+from app.repositories.inventory_repo import InventoryRepository
+from app.repositories.outbox_repo import OutboxRepository
+from app.repositories.payment_payload_repo import PaymentPayloadRepository
+from app.services.order_events import order_events
+from app.services.stripe_service import StripeService
+from app.utils.log_config import get_logger
 
-logger = logging.getLogger("sellphone.payments")
-
-# Use your Stripe Secret Key directly
-stripe.api_key = settings.STRIPE_SECRET_KEY
+logger = get_logger(__name__)
 
 
 class PaymentService:
+    """
+    Payment-intent creation goes through the outbox: the request is written
+    in the order's transaction, the Stripe call happens afterwards (inline
+    or from the outbox worker) and its result is recorded on PaymentAttempt.
+    """
+
+    CREATE_INTENT = "payment_intent.create"
+    REFUND = "payment_intent.refund"
+
     @staticmethod
-    async def create_payment_intent(db: Session, order, user):
+    def request_payment_intent(
+        db: Session, order: Order, user, cart_item_ids: list[int]
+    ) -> dict:
+        """
+        Adds the PaymentAttempt and its outbox event to the caller's
+        transaction (no commit). Returns the event payload.
         """
-        DIRECT STRIPE INTEGRATION:
-        Creates a PaymentIntent directly on Stripe's servers.
+        # Derived from the order so every retry reuses the same Stripe intent
+        idempotency_key = f"checkout-order-{order.id}"
+        attempt = PaymentAttempt(
+            order_id=order.id,
+            external_customer_id=f"CUST-{user.id}",
+            idempotency_key=idempotency_key,
+            amount=order.total_amount,
+            currency="USD",
+            status=PaymentAttemptStatus.INITIATED,
+        )
+        db.add(attempt)
+        db.flush()
+
+        payload = {
+            "order_id": order.id,
+            "attempt_id": attempt.id,
+            # Second half of the partitioned tables' primary keys
+            "order_created_at": order.created_at.isoformat(),
+            "attempt_created_at": attempt.created_at.isoformat(),
+            "amount": order.total_amount,
+            "user_email": user.email,
+            "idempotency_key": idempotency_key,
+            "cart_item_ids": cart_item_ids,
+        }
+        # With inline creation on, give the request a head start before a worker may retry it
+        delay = settings.OUTBOX_INLINE_GRACE_SECONDS if settings.PAYMENT_INTENT_INLINE else 0
+        event = OutboxRepository.enqueue(db, PaymentService.CREATE_INTENT, payload, delay)
+        payload["event_id"] = event.id
+        return payload
+
+    @staticmethod
+    def _load(db: Session, model, row_id: int, created_at: Optional[str] = None):
         """
-        # 1. Generate local identifiers
-        # We still generate an external_order_id for our own internal tracking
-        ext_order_id = f"SP-ORD-{order.id}-{uuid.uuid4().hex[:6]}"
-
-        try:
-            # 2. Call Stripe API
-            # Stripe amount is in cents (integer)
-            amount_in_cents = int(order.total_amount * 100)
-
-            logger.info(f"Initiating direct Stripe PaymentIntent for Order {order.id}")
-
-            intent = stripe.PaymentIntent.create(
-                amount=amount_in_cents,
-                currency="usd",
-                description=f"Payment for Order #{order.id}",
-                metadata={
-                    "order_id": order.id,
-                    "external_order_id": ext_order_id,
-                    "user_id": user.id,
-                },
-                # Stripe handles idempotency natively if we provide a key
-                idempotency_key=str(uuid.uuid4()),
-                automatic_payment_methods={"enabled": True},
-            )
-
-            # 3. Audit Trail: Record the attempt with Stripe's ID (pi_...)
-            attempt = PaymentAttempt(
-                order_id=order.id,
-                external_order_id=intent.id,  # Link directly to Stripe ID
-                external_customer_id=f"CUST-{user.id}",
-                idempotency_key=intent.id,
-                amount=order.total_amount,
-                currency="USD",
-                status=PaymentAttemptStatus.PROCESSING,
-                gateway_response=intent,  # Store the Stripe object for debugging
-            )
-            db.add(attempt)
-            db.commit()
-
-            return {
-                "client_secret": intent.client_secret,
-                "provider_transaction_id": intent.id,
-                "status": intent.status.upper(),
-            }
-
-        except stripe.error.StripeError as e:
-            logger.error(f"Stripe API Failure: {str(e)}")
-            # Record failed attempt locally
-            attempt = PaymentAttempt(
-                order_id=order.id,
-                external_order_id=f"FAILED-{uuid.uuid4().hex[:6]}",
-                amount=order.total_amount,
-                status=PaymentAttemptStatus.FAILED,
-                gateway_response={"error": str(e)},
-            )
-            db.add(attempt)
-            db.commit()
-            return None
-        except Exception as e:
-            logger.critical(
-                f"Unexpected Payment System Failure: {str(e)}", exc_info=True
-            )
-            return None
+        Primary-key lookup on a partitioned table. Events enqueued before
+        payloads carried created_at fall back to a scan by id.
+        """
+        if created_at:
+            return db.get(model, (row_id, datetime.fromisoformat(created_at)))
+        return db.query(model).filter(model.id == row_id).first()
+
+    @staticmethod
+    async def create_intent(payload: dict):
+        """The external call. Raises stripe.error.StripeError"""
+        return await StripeService.create_payment_intent_async(
+            amount=payload["amount"],
+            order_id=payload["order_id"],
+            user_email=payload["user_email"],
+            idempotency_key=payload["idempotency_key"],
+        )
+
+    @staticmethod
+    def record_intent(db: Session, payload: dict, intent):
+        """Links the intent to its attempt and clears the checked-out cart items"""
+        attempt = PaymentService._load(
+            db, PaymentAttempt, payload["attempt_id"], payload.get("attempt_created_at")
+        )
+        if attempt.status == PaymentAttemptStatus.INITIATED:
+            attempt.status = PaymentAttemptStatus.PROCESSING
+        attempt.external_order_id = intent.id  # Stripe's ID (pi_...)
+        attempt.gateway_status = intent.status
+        attempt.client_secret = intent.client_secret
+        PaymentPayloadRepository.store(db, attempt.id, intent)
+        db.query(CartItem).filter(CartItem.id.in_(payload["cart_item_ids"])).delete(
+            synchronize_session=False
+        )
+
+    @staticmethod
+    def record_intent_failure(db: Session, payload: dict, error: str):
+        """Gave up on the intent: cancel the order and release its stock holds"""
+        attempt = PaymentService._load(
+            db, PaymentAttempt, payload["attempt_id"], payload.get("attempt_created_at")
+        )
+        attempt.status = PaymentAttemptStatus.FAILED
+        attempt.gateway_error = error
+        order = PaymentService._load(
+            db, Order, payload["order_id"], payload.get("order_created_at")
+        )
+        if order.order_status == OrderStatus.INITIATED:
+            order.order_status = OrderStatus.CANCELLED
+            order.payment_status = PaymentAttemptStatus.FAILED
+            InventoryRepository.release(db, order.id)
+            order_events.publish(db, order)
+        logger.error(
+            f"Payment intent abandoned for Order {payload['order_id']}: {error}"
+        )
+
+    @staticmethod
+    def request_refund(db: Session, order: Order, attempt: PaymentAttempt):
+        """Adds a full refund of the attempt's intent to the caller's transaction (no commit)"""
+        OutboxRepository.enqueue(
+            db,
+            PaymentService.REFUND,
+            {
+                "order_id": order.id,
+                "attempt_id": attempt.id,
+                "attempt_created_at": attempt.created_at.isoformat(),
+                "intent_id": attempt.external_order_id,
+                # One refund per order, however often the event is retried
+                "idempotency_key": f"refund-order-{order.id}",
+            },
+        )
+
+    @staticmethod
+    async def refund(payload: dict):
+        """The external call. Raises stripe.error.StripeError"""
+        return await StripeService.create_refund_async(
+            payload["intent_id"], payload["order_id"], payload["idempotency_key"]
+        )
+
+    @staticmethod
+    def record_refund(db: Session, payload: dict, refund):
+        attempt = PaymentService._load(
+            db, PaymentAttempt, payload["attempt_id"], payload.get("attempt_created_at")
+        )
+        attempt.gateway_status = f"refund_{refund.status}"  # e.g. refund_succeeded
+        PaymentPayloadRepository.store(db, attempt.id, refund)
+        logger.info(f"Refund {refund.id} issued for Order {payload['order_id']}")
+
+    @staticmethod
+    def record_refund_failure(db: Session, payload: dict, error: str):
+        """Gave up on the refund: left for manual follow-up"""
+        attempt = PaymentService._load(
+            db, PaymentAttempt, payload["attempt_id"], payload.get("attempt_created_at")
+        )
+        attempt.gateway_status = "refund_failed"
+        attempt.gateway_error = error
+        logger.error(
+            f"Refund abandoned for Order {payload['order_id']}, needs manual follow-up: {error}"
+        )
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Bad requests and auth problems won't fix themselves"""
+        return not isinstance(
+            error,
+            (
+                stripe.error.InvalidRequestError,
+                stripe.error.AuthenticationError,
+                stripe.error.PermissionError,
+                stripe.error.CardError,
+            ),
+        )
+
+    @staticmethod
+    def client_secret_for(attempt: PaymentAttempt):
+        return attempt.client_secret if attempt else None
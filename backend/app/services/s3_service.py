@@ -1,57 +1,384 @@
+import asyncio
 import boto3
+import hashlib
+import io
+import threading
+import time
 import uuid
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from fastapi import UploadFile, HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.images import ImageObject
 from app.utils.log_config import logger
+from app.utils.metrics import EXTERNAL_CALL_DURATION, register_collector
+
+MB = 1024 * 1024
 
 s3_client = boto3.client(
     "s3",
     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
     region_name=settings.AWS_REGION,
+    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+    # Every executor thread may run a multipart upload on several connections
+    config=Config(
+        max_pool_connections=settings.S3_UPLOAD_WORKERS * settings.S3_MULTIPART_CONCURRENCY,
+        retries={"max_attempts": 3, "mode": "standard"},
+    ),
+)
+
+
+# Every S3 API call (multipart parts included) lands in external_call_duration_seconds
+def _start_call_timer(model, context, **kwargs):
+    context["metrics_call"] = (model.name, time.perf_counter())
+
+
+def _record_call_time(context, http_response=None, **kwargs):
+    call = context.pop("metrics_call", None)
+    if call is not None:
+        operation, started = call
+        failed = http_response is None or http_response.status_code >= 400
+        EXTERNAL_CALL_DURATION.observe(
+            time.perf_counter() - started, "s3", operation, "error" if failed else "ok"
+        )
+
+
+s3_client.meta.events.register("before-call.s3", _start_call_timer)
+s3_client.meta.events.register("after-call.s3", _record_call_time)
+s3_client.meta.events.register("after-call-error.s3", _record_call_time)  # No response
+
+transfer_config = TransferConfig(
+    multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+    multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE_MB * MB,
+    max_concurrency=settings.S3_MULTIPART_CONCURRENCY,
 )
 
+# boto3 is blocking; server-side uploads run here instead of on the event loop
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload"
+)
+
+# In-process upload counters (seconds), updated under _stats_lock
+_stats_lock = threading.Lock()
+upload_stats = {
+    "uploads": 0,
+    "failures": 0,
+    "in_flight": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+    "transfer_seconds_total": 0.0,
+    "transfer_seconds_max": 0.0,
+    "bytes_total": 0,
+    "dedup_hits": 0,  # Content already stored; upload skipped
+}
+
+
+def _upload_stats_metrics():
+    with _stats_lock:
+        stats = dict(upload_stats)
+    for metric, kind, key in (
+        ("s3_uploads_in_flight", "gauge", "in_flight"),
+        ("s3_uploads_total", "counter", "uploads"),
+        ("s3_upload_failures_total", "counter", "failures"),
+        ("s3_upload_dedup_hits_total", "counter", "dedup_hits"),
+        ("s3_upload_bytes_total", "counter", "bytes_total"),
+        ("s3_upload_queue_seconds_total", "counter", "queue_seconds_total"),
+        ("s3_upload_transfer_seconds_total", "counter", "transfer_seconds_total"),
+    ):
+        yield f"# TYPE {metric} {kind}"
+        yield f"{metric} {stats[key]}"
+
+
+register_collector(_upload_stats_metrics)
+
+# Content types accepted for direct uploads, with the extension used in the key
+IMAGE_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+
+# Keys are write-once (content hash, uuid or derived from one), so an object
+# never changes under its URL and browsers/CDN can cache it for good
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _origin_base() -> str:
+    if settings.AWS_S3_ENDPOINT_URL:
+        return f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_S3_BUCKET_NAME}"
+    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION}.amazonaws.com"
+
+
+def _put(fileobj, file_key: str, content_type: str, size: int, enqueued_at: float):
+    started = time.perf_counter()
+    queued = started - enqueued_at
+    try:
+        s3_client.upload_fileobj(
+            fileobj,
+            settings.AWS_S3_BUCKET_NAME,
+            file_key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE},
+            Config=transfer_config,
+        )
+    except Exception:
+        with _stats_lock:
+            upload_stats["failures"] += 1
+            upload_stats["in_flight"] -= 1
+        raise
+    transfer = time.perf_counter() - started
+    with _stats_lock:
+        upload_stats["in_flight"] -= 1
+        upload_stats["uploads"] += 1
+        upload_stats["bytes_total"] += size
+        upload_stats["queue_seconds_total"] += queued
+        upload_stats["queue_seconds_max"] = max(upload_stats["queue_seconds_max"], queued)
+        upload_stats["transfer_seconds_total"] += transfer
+        upload_stats["transfer_seconds_max"] = max(upload_stats["transfer_seconds_max"], transfer)
+    logger.info(
+        "S3 upload success: key=%s bytes=%s queue_ms=%.1f transfer_ms=%.1f",
+        file_key,
+        size,
+        queued * 1000,
+        transfer * 1000,
+    )
+
+
+def _exists(file_key: str) -> bool:
+    try:
+        s3_client.head_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=file_key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def _stamp(file_key: str):
+    """
+    Marks a shared key as just used, before the dedup check: image_gc only
+    deletes unreferenced objects whose image_objects row wasn't stamped
+    within its grace period, and S3's LastModified doesn't move on a dedup hit.
+    """
+    db = SessionLocal()
+    try:
+        stmt = pg_insert(ImageObject).values(key=file_key, ref_count=0, updated_at=func.now())
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ImageObject.key], set_={"updated_at": func.now()}
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _put_content_addressed(
+    fileobj, prefix: str, extension: str, content_type: str, size: int, enqueued_at: float
+) -> str:
+    """
+    Keys the object by the SHA-256 of its bytes, hashed in chunks off the
+    local spool, and skips the transfer when that key already exists.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(MB), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    file_key = f"{prefix}/{digest.hexdigest()}.{extension}"
+    try:
+        _stamp(file_key)
+        exists = _exists(file_key)
+    except Exception:
+        with _stats_lock:
+            upload_stats["failures"] += 1
+            upload_stats["in_flight"] -= 1
+        raise
+    if exists:
+        with _stats_lock:
+            upload_stats["in_flight"] -= 1
+            upload_stats["dedup_hits"] += 1
+        logger.info("S3 upload skipped, content already stored: key=%s", file_key)
+        return file_key
+    _put(fileobj, file_key, content_type, size, enqueued_at)
+    return file_key
+
 
 class S3Service:
     @staticmethod
-    def upload_image(file: UploadFile, max_file_size: int = 5) -> str:
+    def public_url(file_key: str) -> str:
+        """The one place image URLs are built: the CDN base if set, else the bucket"""
+        base = settings.PUBLIC_ASSET_BASE_URL or _origin_base()
+        return f"{base.rstrip('/')}/{file_key}"
+
+    @staticmethod
+    def origin_url(file_key: str) -> str:
+        """The object's direct bucket URL (what public_url returns without a CDN)"""
+        return f"{_origin_base()}/{file_key}"
+
+    @staticmethod
+    def key_from_url(url: str) -> Optional[str]:
         """
-        Uploads image with a file size limit.
-        :param max_file_size: Size in MB (default 5MB)
+        Inverse of public_url; also accepts direct bucket URLs stored before
+        a CDN. None when the URL has no key after its host/base.
+        """
+        for base in (settings.PUBLIC_ASSET_BASE_URL, _origin_base()):
+            if base and url.startswith(base.rstrip("/") + "/"):
+                return url[len(base.rstrip("/")) + 1 :] or None
+        _, _, path = url.split("://", 1)[-1].partition("/")
+        return path or None
+
+    @staticmethod
+    def create_image_upload(prefix: str, owner_id: int, content_type: str) -> dict:
+        """
+        Presigned POST for a browser-to-S3 upload. The policy pins the key
+        (under `prefix/owner_id/`), the content type and the size limit.
         """
+        if content_type not in IMAGE_TYPES:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported image type. Allowed: {', '.join(IMAGE_TYPES)}",
+            )
+        file_key = f"{prefix}/{owner_id}/{uuid.uuid4()}.{IMAGE_TYPES[content_type]}"
+        max_bytes = settings.IMAGE_MAX_UPLOAD_MB * MB
+        post = s3_client.generate_presigned_post(
+            Bucket=settings.AWS_S3_BUCKET_NAME,
+            Key=file_key,
+            Fields={"Content-Type": content_type, "Cache-Control": IMMUTABLE},
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Cache-Control": IMMUTABLE},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=settings.IMAGE_UPLOAD_URL_EXPIRES_SECONDS,
+        )
+        logger.info("S3 presigned upload issued: key=%s", file_key)
+        return {
+            "url": post["url"],
+            "fields": post["fields"],
+            "key": file_key,
+            "expires_in": settings.IMAGE_UPLOAD_URL_EXPIRES_SECONDS,
+        }
+
+    @staticmethod
+    def confirm_image_upload(prefix: str, owner_id: int, file_key: str) -> str:
+        """Checks a direct upload landed (and is what the policy allowed); returns its URL"""
+        if not file_key.startswith(f"{prefix}/{owner_id}/") or ".." in file_key:
+            raise HTTPException(status_code=400, detail="Unknown upload key")
         try:
-            max_bytes = max_file_size * 1024 * 1024
-            file.file.seek(0, 2)  # Move to end of file
-            file_size = file.file.tell()  # Get current position (size)
-            file.file.seek(0)  # Reset to beginning for upload
-
-            if file_size > max_bytes:
-                logger.warning(
-                    "S3 upload blocked: File too large (%s bytes)", file_size
-                )
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File too large. Maximum allowed size is {max_file_size}MB.",
-                )
-
-            extension = file.filename.split(".")[-1]
-            file_key = f"products/{uuid.uuid4()}.{extension}"
-            logger.info("S3 upload start: filename=%s key=%s", file.filename, file_key)
-
-            s3_client.upload_fileobj(
-                file.file,
-                settings.AWS_S3_BUCKET_NAME,
-                file_key,
-                ExtraArgs={"ContentType": file.content_type},
+            head = s3_client.head_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=file_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise HTTPException(status_code=400, detail="Upload not found")
+            logger.error("S3 head failed: key=%s error=%s", file_key, e)
+            raise HTTPException(status_code=502, detail="Could not verify upload")
+
+        max_bytes = settings.IMAGE_MAX_UPLOAD_MB * MB
+        if head["ContentLength"] > max_bytes or head.get("ContentType") not in IMAGE_TYPES:
+            logger.warning("S3 upload rejected on confirm: key=%s", file_key)
+            s3_client.delete_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=file_key)
+            raise HTTPException(status_code=400, detail="Upload does not match the policy")
+
+        logger.info("S3 upload confirmed: key=%s", file_key)
+        return S3Service.public_url(file_key)
+
+    @staticmethod
+    def _prepare_upload(file: UploadFile, max_file_size: int):
+        """
+        Type and size check for a server-side upload. Returns (extension, size);
+        the extension comes from the validated content type, never the filename.
+        """
+        if file.content_type not in IMAGE_TYPES:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported image type. Allowed: {', '.join(IMAGE_TYPES)}",
             )
+        max_bytes = max_file_size * MB
+        file.file.seek(0, 2)  # Move to end of file
+        file_size = file.file.tell()  # Get current position (size)
+        file.file.seek(0)  # Reset to beginning for upload
 
-            url = f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION}.amazonaws.com/{file_key}"
-            logger.info("S3 upload success: key=%s", file_key)
-            return url
-        except HTTPException:
-            # Re-raise the size exception so it's not caught by the generic block
-            raise
+        if file_size > max_bytes:
+            logger.warning("S3 upload blocked: File too large (%s bytes)", file_size)
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum allowed size is {max_file_size}MB.",
+            )
 
+        extension = IMAGE_TYPES[file.content_type]
+        logger.info("S3 upload start: filename=%s size=%s", file.filename, file_size)
+        return extension, file_size
+
+    @staticmethod
+    def upload_image(file: UploadFile, max_file_size: int = 5, prefix: str = "products") -> str:
+        """
+        Blocking upload with a file size limit, for sync callers. Objects are
+        content-addressed: identical images share one key.
+        :param max_file_size: Size in MB (default 5MB)
+        """
+        extension, file_size = S3Service._prepare_upload(file, max_file_size)
+        with _stats_lock:
+            upload_stats["in_flight"] += 1
+        try:
+            file_key = _put_content_addressed(
+                file.file, prefix, extension, file.content_type, file_size, time.perf_counter()
+            )
         except Exception as e:
             logger.error("S3 upload failed: filename=%s error=%s", file.filename, e)
             raise HTTPException(status_code=500, detail=f"S3 Upload failed: {str(e)}")
+        return S3Service.public_url(file_key)
+
+    @staticmethod
+    async def upload_image_async(
+        file: UploadFile, max_file_size: int = 5, prefix: str = "products"
+    ) -> str:
+        """Non-blocking upload_image: hashing and transfer run on the upload executor"""
+        extension, file_size = S3Service._prepare_upload(file, max_file_size)
+        with _stats_lock:
+            upload_stats["in_flight"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            file_key = await loop.run_in_executor(
+                _upload_executor,
+                _put_content_addressed,
+                file.file,
+                prefix,
+                extension,
+                file.content_type,
+                file_size,
+                time.perf_counter(),
+            )
+        except Exception as e:
+            logger.error("S3 upload failed: filename=%s error=%s", file.filename, e)
+            raise HTTPException(status_code=500, detail=f"S3 Upload failed: {str(e)}")
+        return S3Service.public_url(file_key)
+
+    @staticmethod
+    async def upload_bytes_async(file_key: str, data: bytes, content_type: str) -> str:
+        """Uploads an in-memory object (e.g. a generated variant) on the upload executor"""
+        with _stats_lock:
+            upload_stats["in_flight"] += 1
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            _upload_executor,
+            _put,
+            io.BytesIO(data),
+            file_key,
+            content_type,
+            len(data),
+            time.perf_counter(),
+        )
+        return S3Service.public_url(file_key)
+
+    @staticmethod
+    async def download_async(file_key: str) -> bytes:
+        def _get():
+            buffer = io.BytesIO()
+            s3_client.download_fileobj(
+                settings.AWS_S3_BUCKET_NAME, file_key, buffer, Config=transfer_config
+            )
+            return buffer.getvalue()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_upload_executor, _get)
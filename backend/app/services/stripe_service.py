@@ -1,9 +1,27 @@
+import asyncio
 import stripe
-import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from app.core.config import settings
+from app.utils.log_config import get_logger
+from app.utils.metrics import external_call
 
-logger = logging.getLogger("sellphone.stripe")
+logger = get_logger(__name__)
 stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    # e.g. the local fake server in tools/fake_stripe.py
+    stripe.api_base = settings.STRIPE_API_BASE
+
+# stripe-python is blocking; its calls run here instead of on the event loop
+# (or in the shared threadpool that serves sync routes).
+_stripe_executor = ThreadPoolExecutor(
+    max_workers=settings.STRIPE_EXECUTOR_WORKERS, thread_name_prefix="stripe"
+)
+
+
+def _timed(operation: str, call, *args, **kwargs):
+    with external_call("stripe", operation):
+        return call(*args, **kwargs)
 
 
 class StripeService:
@@ -17,7 +35,9 @@ class StripeService:
             # Stripe expects amount in cents/paise (int)
             amount_in_cents = int(amount * 100)
 
-            intent = stripe.PaymentIntent.create(
+            intent = _timed(
+                "payment_intent.create",
+                stripe.PaymentIntent.create,
                 amount=amount_in_cents,
                 currency="usd",
                 metadata={"order_id": order_id, "user_email": user_email},
@@ -28,6 +48,55 @@ class StripeService:
             logger.error(f"Stripe Intent Error: {str(e)}")
             raise Exception("Payment provider is currently unavailable.")
 
+    @staticmethod
+    async def create_payment_intent_async(
+        amount: float, order_id: int, user_email: str, idempotency_key: str
+    ):
+        """
+        Non-blocking PaymentIntent creation on the Stripe executor.
+        Raises stripe.error.StripeError; retries with the same idempotency_key
+        return the original intent instead of creating a new one.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _stripe_executor,
+            partial(
+                _timed,
+                "payment_intent.create",
+                stripe.PaymentIntent.create,
+                amount=int(round(amount * 100)),
+                currency="usd",
+                metadata={"order_id": order_id, "user_email": user_email},
+                automatic_payment_methods={"enabled": True},
+                idempotency_key=idempotency_key,
+            ),
+        )
+
+    @staticmethod
+    async def retrieve_payment_intent_async(intent_id: str):
+        """Non-blocking PaymentIntent lookup on the Stripe executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _stripe_executor,
+            partial(_timed, "payment_intent.retrieve", stripe.PaymentIntent.retrieve, intent_id),
+        )
+
+    @staticmethod
+    async def create_refund_async(intent_id: str, order_id: int, idempotency_key: str):
+        """Non-blocking full refund of a PaymentIntent. Raises stripe.error.StripeError"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _stripe_executor,
+            partial(
+                _timed,
+                "refund.create",
+                stripe.Refund.create,
+                payment_intent=intent_id,
+                metadata={"order_id": order_id},
+                idempotency_key=idempotency_key,
+            ),
+        )
+
     @staticmethod
     def verify_webhook(payload: bytes, sig_header: str):
         """
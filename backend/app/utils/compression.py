@@ -0,0 +1,30 @@
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional; payloads fall back to zlib
+    zstandard = None
+
+ZSTD = "zstd"
+ZLIB = "zlib"
+
+
+def compress_json(data) -> tuple[str, bytes]:
+    """Serialises `data` compactly and compresses it. Returns (codec, blob)"""
+    raw = json.dumps(data, separators=(",", ":"), default=str).encode()
+    if zstandard is not None:
+        return ZSTD, zstandard.ZstdCompressor(level=10).compress(raw)
+    return ZLIB, zlib.compress(raw, 9)
+
+
+def decompress_json(codec: str, blob: bytes):
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd payloads")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == ZLIB:
+        raw = zlib.decompress(blob)
+    else:
+        raise ValueError(f"Unknown codec {codec!r}")
+    return json.loads(raw)
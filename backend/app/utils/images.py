@@ -0,0 +1,45 @@
+"""
+CPU-bound image work, run in a process pool by ImageService. Kept free of
+app imports so pool processes start cheaply.
+"""
+import io
+
+# Variant format -> (Pillow format, content type, save options)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+class ImageProcessingError(ValueError):
+    """The source isn't a readable image; retrying won't help"""
+
+
+def variant_key(file_key: str, width: int, fmt: str) -> str:
+    """products/abc.png -> products/abc_320w.webp"""
+    stem = file_key.rsplit(".", 1)[0]
+    return f"{stem}_{width}w.{fmt}"
+
+
+def render_variants(data: bytes, widths: list[int]) -> dict:
+    """Returns {(width, fmt): (bytes, content_type)}; never upscales"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageProcessingError(str(e)) from e
+
+    source = ImageOps.exif_transpose(source).convert("RGB")
+    rendered = {}
+    for width in sorted(widths):
+        image = source
+        if source.width > width:
+            height = round(source.height * width / source.width)
+            image = source.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, content_type, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, format=pil_format, **options)
+            rendered[(width, fmt)] = (buffer.getvalue(), content_type)
+    return rendered
@@ -1,38 +1,229 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Optional
+from app.core.config import settings
+from app.utils.metrics import register_collector
+
+# Extra fields of the JSON schema; always present, null when a record has none
+RECORD_FIELDS = ("method", "route", "status", "duration_ms", "client")
+
+
+class RequestLog:
+    """
+    Per-request logging state. While `held` is a deque, the request's records
+    wait there for the tail-sampling decision made in end_request; only the
+    last LOG_HELD_RECORDS_MAX are kept, so long streams stay bounded.
+    """
+
+    __slots__ = ("request_id", "held")
+
+    def __init__(self, request_id: str, hold: bool):
+        self.request_id = request_id
+        self.held: Optional[deque] = (
+            deque(maxlen=settings.LOG_HELD_RECORDS_MAX) if hold else None
+        )
+
+
+_request_log: ContextVar[Optional[RequestLog]] = ContextVar("request_log", default=None)
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+def current_request_id() -> Optional[str]:
+    state = _request_log.get()
+    return state.request_id if state else None
+
+
+def begin_request(request_id: str):
+    """
+    Head sampling: LOG_SUCCESS_SAMPLE_RATE of requests log straight through;
+    the rest are held until end_request knows whether they failed or were slow.
+    """
+    hold = random.random() >= settings.LOG_SUCCESS_SAMPLE_RATE
+    return _request_log.set(RequestLog(request_id, hold))
+
+
+def end_request(token, keep: bool):
+    """Tail sampling: `keep` (error or slow) flushes held records, otherwise they're dropped"""
+    state = _request_log.get()
+    _request_log.reset(token)
+    if state is not None and state.held and keep:
+        held, state.held = state.held, None
+        _flush(held)
+
+
+def _flush(held):
+    """
+    Straight onto the queue: held records already passed the handler's
+    filters when they were logged, so handle() would sample them twice
+    """
+    if _queue_handler is None:
+        return
+    for record in held:
+        _queue_handler.enqueue(_queue_handler.prepare(record))
+
+
+class RequestContextFilter(logging.Filter):
+    """Runs on the caller's thread: stamps the request id and holds sampled-out records"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            state = _request_log.get()
+            record.request_id = state.request_id if state else None
+            if state is not None and state.held is not None:
+                if record.levelno < logging.WARNING:
+                    state.held.append(record)
+                    return False
+                # A warning or error: keep the whole request from here on
+                held, state.held = state.held, None
+                _flush(held)
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for field in RECORD_FIELDS:
+            entry[field] = getattr(record, field, None)
+        entry["exc"] = record.exc_text or (
+            self.formatException(record.exc_info) if record.exc_info else None
+        )
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Never blocks the caller: when the queue is full, records below WARNING
+    are dropped at once and WARNING+ wait briefly for room before being
+    dropped too. `dropped` counts the losses.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now, but leave formatting
+        # (and the record's extra fields) to the listener's handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=0.05)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """stop() waits for room for its sentinel instead of failing on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of sub-WARNING records per logger prefix (LOG_SAMPLE_RATES)"""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so the most specific rate wins
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name.startswith(prefix):
+                return random.random() < rate
+        return True
+
+
+def _output_handlers() -> list[logging.Handler]:
+    # Resolve logs path: backend/app/utils -> project_root/logs
+    project_root = Path(__file__).resolve().parent.parent.parent.parent
+    log_dir = project_root / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / "app.log"
+
+    if settings.LOG_FORMAT == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        )
+
+    # 1. File Handler (Rotates at 5MB, keeps 5 backup files)
+    file_handler = RotatingFileHandler(str(log_file), maxBytes=5 * 1024 * 1024, backupCount=5)
+    file_handler.setFormatter(formatter)
+
+    # 2. Console Handler (To see logs in terminal)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    return [file_handler, console_handler]
 
 
 def setup_logger():
+    """
+    Callers only enqueue records; formatting, writes and rotation happen on
+    the QueueListener's thread.
+    """
+    global _queue_handler
     logger = logging.getLogger("fastapi_app")
-    logger.setLevel(logging.INFO)
+    logger.setLevel(settings.LOG_LEVEL)
 
     # Prevent duplicate logs if setup_logger is called multiple times
     if not logger.handlers:
-        # Resolve logs path: backend/app/utils -> project_root/logs
-        project_root = Path(__file__).resolve().parent.parent.parent.parent
-        log_dir = project_root / "logs"
-        log_dir.mkdir(parents=True, exist_ok=True)
-        log_file = log_dir / "app.log"
+        handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        if settings.LOG_SAMPLE_RATES:
+            handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
+        _queue_handler = handler
 
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        listener = DrainingQueueListener(
+            handler.queue, *_output_handlers(), respect_handler_level=True
         )
+        listener.start()
+        atexit.register(listener.stop)  # Flushes what's still queued
 
-        # 1. File Handler (Rotates at 5MB, keeps 5 backup files)
-        file_handler = RotatingFileHandler(
-            str(log_file), maxBytes=5 * 1024 * 1024, backupCount=5
-        )
-        file_handler.setFormatter(formatter)
+        # Per-logger levels, e.g. to demote chatty repositories
+        for name, level in settings.LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
 
-        # 2. Console Handler (To see logs in terminal)
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
+    return logger
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
 
-    return logger
+def _log_metrics():
+    yield "# TYPE log_records_dropped_total counter"
+    yield f"log_records_dropped_total {_queue_handler.dropped if _queue_handler else 0}"
+
+
+register_collector(_log_metrics)
 
 
 def get_logger(name: str) -> logging.Logger:
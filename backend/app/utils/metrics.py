@@ -0,0 +1,190 @@
+"""
+In-process metrics in the Prometheus text format, served at GET /metrics.
+
+Each uvicorn worker keeps its own values (like s3_service.upload_stats), so
+scrape every worker or run one per pod. Recording is a lock plus a bisect;
+there's no per-call allocation beyond the label tuple.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+# Seconds; covers ~1ms DB round trips up to slow checkout/Stripe calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: list["_Metric"] = []
+_collectors: list[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(labels, self._snapshot(value)) for labels, value in self._values.items()]
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple = (), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then the sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _snapshot(self, value):
+        return list(value[0]), value[1]
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _labels(self.labelnames, labels, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        suffix = _labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{suffix} {total}")
+        lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """For values kept elsewhere (e.g. upload_stats): yields exposition lines at scrape time"""
+    _collectors.append(collector)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "Requests handled.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency.", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled.")
+DB_REQUEST_DURATION = Histogram(
+    "http_request_db_seconds", "Time spent in DB queries per request.", ("method", "route")
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed.")
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement latency.")
+EXTERNAL_CALL_DURATION = Histogram(
+    "external_call_duration_seconds",
+    "Latency of Stripe and S3 calls.",
+    ("service", "operation", "outcome"),
+)
+
+
+class _DBTime:
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+# Mutable holder, so statements run in threadpool copies of the context still add up
+_db_time: ContextVar[Optional[_DBTime]] = ContextVar("db_time", default=None)
+
+
+def begin_db_timing():
+    return _db_time.set(_DBTime())
+
+
+def end_db_timing(token) -> float:
+    state = _db_time.get()
+    _db_time.reset(token)
+    return state.seconds if state else 0.0
+
+
+def record_query(seconds: float):
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(seconds)
+    state = _db_time.get()
+    if state is not None:
+        state.seconds += seconds
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EXTERNAL_CALL_DURATION.observe(time.perf_counter() - start, service, operation, outcome)
@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.admission_service import FlashSaleAdmission
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run_flash_sale_refresher():
+    """Keeps flash-sale token budgets in line with available stock"""
+    while True:
+        try:
+            await FlashSaleAdmission.refresh()
+        except Exception as e:
+            logger.error("Flash-sale budget refresh failed: %s", e, exc_info=True)
+        await asyncio.sleep(settings.FLASH_SALE_REFRESH_SECONDS)
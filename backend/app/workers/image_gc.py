@@ -0,0 +1,161 @@
+"""
+Deletes S3 images nothing references any more: replaced profile pictures,
+uploads whose product insert failed, images of deleted products.
+
+    python -m app.workers.image_gc --grace-hours 24 [--dry-run]
+
+The reference set (products.image_url and its variants, profiles.profile_picture)
+is read first, then the prefixes are listed. image_objects.ref_count is not
+trusted for liveness: products removed by the seller's ON DELETE CASCADE
+never release theirs. Objects younger than the grace period are never
+deleted, which covers uploads in flight and presigned uploads not yet confirmed.
+
+A dedup hit reuses an old object without touching its LastModified, so
+image_objects has the final say: candidates without a row are adopted with
+their LastModified, then only rows not stamped within the grace period
+(uploads stamp before their dedup check, acquire on every reference) are
+deleted. That transaction stays open until S3 has deleted the objects, so
+an upload stamping one of those keys waits for it and then finds the
+object gone, instead of deduping against an object about to disappear.
+"""
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, func, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.images import ImageObject
+from app.models.product import Product
+from app.models.user import Profile
+from app.services.s3_service import S3Service, s3_client
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+PREFIXES = ("products/", "profiles/")
+DELETE_BATCH = 1000  # delete_objects limit
+STREAM_BATCH = 5000
+
+
+def referenced_keys() -> set[str]:
+    keys = set()
+    db = SessionLocal()
+    try:
+        queries = (
+            select(Product.image_url, Product.image_variants).where(Product.image_url.isnot(None)),
+            select(Profile.profile_picture, null()).where(Profile.profile_picture.isnot(None)),
+        )
+        for query in queries:
+            rows = db.execute(query.execution_options(stream_results=True, yield_per=STREAM_BATCH))
+            for url, variants in rows:
+                keys.add(S3Service.key_from_url(url))
+                for formats in (variants or {}).values():
+                    keys.update(S3Service.key_from_url(u) for u in formats.values())
+    finally:
+        db.close()
+    keys.discard(None)  # Stored URLs without a key
+    return keys
+
+
+def orphaned_keys(references: set[str], older_than: datetime):
+    """Yields (key, LastModified) for unreferenced objects past the grace period"""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for prefix in PREFIXES:
+        for page in paginator.paginate(Bucket=settings.AWS_S3_BUCKET_NAME, Prefix=prefix):
+            for obj in page.get("Contents", ()):
+                if obj["Key"] not in references and obj["LastModified"] < older_than:
+                    yield obj["Key"], obj["LastModified"]
+
+
+def _claim(db, candidates: dict[str, datetime], older_than: datetime) -> list[str]:
+    """Deletes (uncommitted) the image_objects rows not stamped recently; returns their keys"""
+    db.execute(
+        pg_insert(ImageObject)
+        .values(
+            [
+                {"key": key, "ref_count": 0, "updated_at": last_modified}
+                for key, last_modified in candidates.items()
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[ImageObject.key])
+    )
+    return (
+        db.execute(
+            delete(ImageObject)
+            .where(
+                ImageObject.key.in_(list(candidates)),
+                func.coalesce(ImageObject.updated_at, ImageObject.created_at) < older_than,
+            )
+            .returning(ImageObject.key)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def _delete(keys: list[str]) -> int:
+    response = s3_client.delete_objects(
+        Bucket=settings.AWS_S3_BUCKET_NAME,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    # Their rows are gone; the next run adopts them again from the listing
+    errors = response.get("Errors", ())
+    for error in errors:
+        logger.error("Image GC: could not delete %s: %s", error["Key"], error.get("Message"))
+    return len(keys) - len(errors)
+
+
+def _collect_batch(candidates: dict, older_than: datetime, dry_run: bool, summary: dict):
+    db = SessionLocal()
+    try:
+        keys = _claim(db, candidates, older_than)
+        summary["claimed"] += len(keys)
+        if dry_run:
+            for key in keys:
+                logger.info("Image GC (dry run): would delete %s", key)
+            db.rollback()
+            return
+        if keys:
+            # Row locks held until S3 is done; a failure rolls the claim back
+            summary["deleted"] += _delete(keys)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def collect(grace: timedelta, dry_run: bool = False) -> dict:
+    older_than = datetime.now(timezone.utc) - grace
+    references = referenced_keys()
+    summary = {"referenced": len(references), "orphaned": 0, "claimed": 0, "deleted": 0}
+
+    batch = {}
+    for key, last_modified in orphaned_keys(references, older_than):
+        summary["orphaned"] += 1
+        batch[key] = last_modified
+        if len(batch) == DELETE_BATCH:
+            _collect_batch(batch, older_than, dry_run, summary)
+            batch = {}
+    if batch:
+        _collect_batch(batch, older_than, dry_run, summary)
+
+    logger.info("Image GC: %s", summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grace-hours", type=int, default=24)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    summary = collect(timedelta(hours=args.grace_hours), args.dry_run)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import asyncio
+import psycopg2
+from app.core.config import settings
+from app.db.session import DATABASE_URL
+from app.services.order_events import order_events
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+RECONNECT_SECONDS = 5
+
+
+def _connect():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.set_session(autocommit=True)
+    with conn.cursor() as cursor:
+        cursor.execute(f'LISTEN "{settings.ORDER_EVENTS_CHANNEL}"')
+    return conn
+
+
+async def run_order_event_listener():
+    """
+    Holds one dedicated LISTEN connection per process and feeds its
+    notifications to order_events; reconnects if the connection drops.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        conn = None
+        try:
+            conn = await asyncio.to_thread(_connect)
+            lost = loop.create_future()
+
+            def on_readable():
+                try:
+                    conn.poll()
+                except Exception as e:
+                    if not lost.done():
+                        lost.set_exception(e)
+                    return
+                while conn.notifies:
+                    order_events.dispatch(conn.notifies.pop(0).payload)
+
+            loop.add_reader(conn.fileno(), on_readable)
+            order_events.resync()  # Covers anything sent while we weren't listening
+            try:
+                await lost
+            finally:
+                loop.remove_reader(conn.fileno())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Order event listener failed: %s", e, exc_info=True)
+        finally:
+            if conn is not None:
+                conn.close()
+        await asyncio.sleep(RECONNECT_SECONDS)
@@ -0,0 +1,169 @@
+"""
+Drains the outbox table. Run inside the API process (started from the
+lifespan) or standalone:
+
+    python -m app.workers.outbox_worker
+"""
+import asyncio
+from typing import Awaitable, Callable, NamedTuple, Optional
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.outbox_repo import OutboxRepository
+from app.services.payment_service import PaymentService
+from app.services.image_service import ImageService
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class OutboxHandler(NamedTuple):
+    call: Callable[[dict], Awaitable]  # The external side effect
+    on_success: Callable  # (db, payload, result), same transaction as mark_done
+    on_give_up: Callable  # (db, payload, error), same transaction as mark_failed
+    is_retryable: Callable[[Exception], bool] = lambda e: True
+
+
+HANDLERS = {
+    PaymentService.CREATE_INTENT: OutboxHandler(
+        call=PaymentService.create_intent,
+        on_success=PaymentService.record_intent,
+        on_give_up=PaymentService.record_intent_failure,
+        is_retryable=PaymentService.is_retryable,
+    ),
+    PaymentService.REFUND: OutboxHandler(
+        call=PaymentService.refund,
+        on_success=PaymentService.record_refund,
+        on_give_up=PaymentService.record_refund_failure,
+        is_retryable=PaymentService.is_retryable,
+    ),
+    ImageService.GENERATE_VARIANTS: OutboxHandler(
+        call=ImageService.generate_variants,
+        on_success=ImageService.record_variants,
+        on_give_up=ImageService.record_variants_failure,
+        is_retryable=ImageService.is_retryable,
+    ),
+}
+
+
+class OutboxLane(NamedTuple):
+    """Workers that claim only their own kinds, with their own batch size and lease"""
+
+    name: str
+    workers: int
+    batch_size: int
+    lease_seconds: int
+    kinds: Optional[tuple] = None  # None: everything not claimed by another lane
+    exclude_kinds: Optional[tuple] = None
+
+
+# Image jobs (download, process-pool render, several uploads) take seconds; in
+# a shared batch every client secret would wait for the slowest render
+IMAGE_KINDS = (ImageService.GENERATE_VARIANTS,)
+
+DEFAULT_LANE = OutboxLane(
+    "default",
+    workers=settings.OUTBOX_WORKERS,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    exclude_kinds=IMAGE_KINDS,
+)
+IMAGE_LANE = OutboxLane(
+    "images",
+    workers=settings.OUTBOX_IMAGE_WORKERS,
+    batch_size=settings.OUTBOX_IMAGE_BATCH_SIZE,
+    lease_seconds=settings.OUTBOX_IMAGE_LEASE_SECONDS,
+    kinds=IMAGE_KINDS,
+)
+LANES = (DEFAULT_LANE, IMAGE_LANE)
+
+
+def _claim(lane: OutboxLane):
+    db = SessionLocal()
+    try:
+        rows = OutboxRepository.claim_batch(
+            db,
+            lane.batch_size,
+            lane.lease_seconds,
+            kinds=lane.kinds,
+            exclude_kinds=lane.exclude_kinds,
+        )
+        db.commit()
+        return rows
+    finally:
+        db.close()
+
+
+def _record(rows, results):
+    """Applies a whole batch of outcomes in one transaction, one savepoint per event"""
+    db = SessionLocal()
+    try:
+        for (event_id, kind, payload, attempts), result in zip(rows, results):
+            handler = HANDLERS[kind]
+            try:
+                with db.begin_nested():
+                    if not isinstance(result, Exception):
+                        handler.on_success(db, payload, result)
+                        OutboxRepository.mark_done(db, event_id)
+                    elif handler.is_retryable(result) and OutboxRepository.mark_retry(
+                        db, event_id, attempts, str(result)
+                    ):
+                        logger.warning(
+                            "Outbox retry scheduled: event_id=%s kind=%s attempt=%s error=%s",
+                            event_id,
+                            kind,
+                            attempts,
+                            result,
+                        )
+                    else:
+                        handler.on_give_up(db, payload, str(result))
+                        OutboxRepository.mark_failed(db, event_id, str(result))
+            except Exception as e:
+                # Lease expiry makes the event claimable again
+                logger.error(
+                    "Outbox result not recorded: event_id=%s error=%s", event_id, e, exc_info=True
+                )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _dispatch(kind: str, payload: dict):
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        raise LookupError(f"No outbox handler for {kind}")
+    return await handler.call(payload)
+
+
+async def drain_once(lane: OutboxLane = DEFAULT_LANE) -> int:
+    """Claims one batch, performs its external calls concurrently, records results"""
+    rows = await asyncio.to_thread(_claim, lane)
+    if not rows:
+        return 0
+    results = await asyncio.gather(
+        *(_dispatch(kind, payload) for _, kind, payload, _ in rows),
+        return_exceptions=True,
+    )
+    await asyncio.to_thread(_record, rows, results)
+    return len(rows)
+
+
+async def run_outbox_worker(lane: OutboxLane = DEFAULT_LANE, worker_id: int = 0):
+    logger.info("Outbox worker %s/%s started", lane.name, worker_id)
+    while True:
+        try:
+            processed = await drain_once(lane)
+        except Exception as e:
+            logger.error("Outbox worker %s/%s error: %s", lane.name, worker_id, e, exc_info=True)
+            processed = 0
+        if processed < lane.batch_size:
+            await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+
+async def run_outbox_pool():
+    await asyncio.gather(
+        *(run_outbox_worker(lane, i) for lane in LANES for i in range(lane.workers))
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run_outbox_pool())
@@ -0,0 +1,180 @@
+"""
+Monthly partition upkeep for orders, order_items and payment_attempts.
+
+    python -m app.workers.partition_maintenance ensure --months-ahead 3
+    python -m app.workers.partition_maintenance archive --older-than-months 24 \
+        --archive-dir /var/lib/sellphone/archive [--keep-detached]
+
+`ensure` creates upcoming month partitions. `archive` detaches partitions
+that ended before the cutoff, writes each to <archive-dir>/<partition>.csv.gz
+(COPY, gzip) and drops it unless --keep-detached is given. A partition whose
+export fails is attached again, so its rows never drop out of queries.
+
+Both take a transaction-level advisory lock, so the per-process
+maintainers (and a manual run) don't race on CREATE/DETACH.
+"""
+import argparse
+import asyncio
+import gzip
+import re
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import List
+from sqlalchemy import text
+from app.db.session import engine
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+PARTITIONED_TABLES = ("orders", "order_items", "payment_attempts")
+_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+_LOCK = text("SELECT pg_advisory_xact_lock(hashtext('partition_maintenance'))")
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def list_partitions(conn, table: str) -> List[str]:
+    return [
+        row[0]
+        for row in conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table ORDER BY c.relname"
+            ),
+            {"table": table},
+        )
+    ]
+
+
+def ensure_partitions(months_ahead: int = 3) -> List[str]:
+    """Creates missing month partitions from this month to `months_ahead` out"""
+    created = []
+    this_month = date.today().replace(day=1)
+    with engine.begin() as conn:
+        conn.execute(_LOCK)  # Until commit; the listing below sees the winner's tables
+        for table in PARTITIONED_TABLES:
+            existing = set(list_partitions(conn, table))
+            for offset in range(months_ahead + 1):
+                start = _add_months(this_month, offset)
+                name = partition_name(table, start)
+                if name in existing:
+                    continue
+                # Fails if the DEFAULT partition already holds rows for this
+                # month; those must be moved out by hand first.
+                conn.execute(
+                    text(
+                        f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+                        f"FOR VALUES FROM ('{start}') TO ('{_add_months(start, 1)}')"
+                    )
+                )
+                created.append(name)
+    if created:
+        logger.info("Partition maintenance: created %s", created)
+    return created
+
+
+def _export(name: str, archive_dir: Path) -> Path:
+    """Streams a (detached) partition to a gzip'd CSV via COPY"""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    target = archive_dir / f"{name}.csv.gz"
+    partial = target.with_suffix(".gz.partial")
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor, gzip.open(partial, "wb") as out:
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', out)
+        raw.commit()
+    finally:
+        raw.close()
+    shutil.move(partial, target)  # Only complete archives carry the final name
+    return target
+
+
+def _reattach(table: str, name: str, start: date):
+    with engine.begin() as conn:
+        conn.execute(_LOCK)
+        conn.execute(
+            text(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+                f"FOR VALUES FROM ('{start}') TO ('{_add_months(start, 1)}')"
+            )
+        )
+    logger.error("Partition maintenance: export of %s failed, attached it again", name)
+
+
+def archive_partitions(
+    older_than_months: int, archive_dir: Path, keep_detached: bool = False
+) -> List[Path]:
+    """Detaches, exports and (by default) drops partitions ending before the cutoff"""
+    cutoff = _add_months(date.today().replace(day=1), -older_than_months)
+    archived = []
+    for table in PARTITIONED_TABLES:
+        with engine.connect() as conn:
+            names = list_partitions(conn, table)
+        for name in names:
+            match = _NAME.match(name)
+            if not match or match["table"] != table:
+                continue  # DEFAULT partition or hand-made tables
+            start = date(int(match["year"]), int(match["month"]), 1)
+            if _add_months(start, 1) > cutoff:
+                continue
+
+            with engine.begin() as conn:
+                conn.execute(_LOCK)
+                if name not in list_partitions(conn, table):
+                    continue  # Another run got to it first
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            try:
+                path = _export(name, archive_dir)
+            except Exception:
+                _reattach(table, name, start)
+                raise
+            if not keep_detached:
+                with engine.begin() as conn:
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+            logger.info("Partition maintenance: archived %s -> %s", name, path)
+            archived.append(path)
+    return archived
+
+
+async def run_partition_maintainer():
+    """Keeps next months' partitions in place; started from the app lifespan"""
+    while True:
+        try:
+            await asyncio.to_thread(ensure_partitions)
+        except Exception as e:
+            logger.error("Partition maintenance failed: %s", e, exc_info=True)
+        await asyncio.sleep(24 * 60 * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order partition maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ensure = sub.add_parser("ensure")
+    ensure.add_argument("--months-ahead", type=int, default=3)
+    archive = sub.add_parser("archive")
+    archive.add_argument("--older-than-months", type=int, required=True)
+    archive.add_argument("--archive-dir", type=Path, required=True)
+    archive.add_argument("--keep-detached", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        print(ensure_partitions(args.months_ahead))
+    else:
+        for path in archive_partitions(
+            args.older_than_months, args.archive_dir, args.keep_detached
+        ):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Settles PaymentAttempts stuck in PROCESSING (e.g. their webhook was lost)
+by asking Stripe for the intent's real status.
+
+    python -m app.workers.reconcile_payments --older-than-minutes 30
+    STRIPE_API_BASE=http://127.0.0.1:12111 python -m app.workers.reconcile_payments
+
+Transitions match OrderService.process_payment_webhook.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.orders import PaymentAttempt, PaymentAttemptStatus
+from app.services.order_service import OrderService
+from app.services.stripe_service import StripeService
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Stripe intent status -> success flag for process_payment_webhook (None: leave alone)
+TERMINAL = {"succeeded": True, "canceled": False}
+
+
+def _outcome(intent):
+    if intent.status in TERMINAL:
+        return TERMINAL[intent.status]
+    if intent.status == "requires_payment_method" and getattr(intent, "last_payment_error", None):
+        return False  # Declined; same as a payment_intent.payment_failed event
+    return None
+
+
+def _next_page(last_id: int, cutoff: datetime, batch_size: int):
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(PaymentAttempt.id, PaymentAttempt.external_order_id)
+            .where(
+                PaymentAttempt.status == PaymentAttemptStatus.PROCESSING,
+                PaymentAttempt.external_order_id.isnot(None),
+                PaymentAttempt.created_at < cutoff,
+                PaymentAttempt.id > last_id,
+            )
+            .order_by(PaymentAttempt.id)
+            .limit(batch_size)
+        ).all()
+    finally:
+        db.close()
+
+
+def _apply(intent_id: str, success: bool, intent_created: int) -> bool:
+    db = SessionLocal()
+    try:
+        return OrderService.process_payment_webhook(
+            db, intent_id, success, intent_created
+        )
+    finally:
+        db.close()
+
+
+async def reconcile(
+    older_than: timedelta = timedelta(minutes=30),
+    batch_size: int = 100,
+    concurrency: int = 8,
+    dry_run: bool = False,
+) -> dict:
+    cutoff = datetime.now(timezone.utc) - older_than
+    summary = {"scanned": 0, "succeeded": 0, "failed": 0, "still_pending": 0, "errors": 0}
+    gate = asyncio.Semaphore(concurrency)
+
+    async def check(intent_id: str):
+        # The gate covers the DB apply too: --concurrency bounds sessions, not just lookups
+        async with gate:
+            try:
+                intent = await StripeService.retrieve_payment_intent_async(intent_id)
+            except Exception as e:
+                logger.warning("Reconcile: lookup failed for %s: %s", intent_id, e)
+                summary["errors"] += 1
+                return
+            success = _outcome(intent)
+            if success is None:
+                summary["still_pending"] += 1
+                return
+            if not dry_run and not await asyncio.to_thread(
+                _apply, intent_id, success, intent.created
+            ):
+                summary["errors"] += 1
+                return
+            summary["succeeded" if success else "failed"] += 1
+            logger.info("Reconcile: %s -> %s", intent_id, intent.status)
+
+    last_id = 0
+    while True:
+        page = await asyncio.to_thread(_next_page, last_id, cutoff, batch_size)
+        if not page:
+            break
+        summary["scanned"] += len(page)
+        await asyncio.gather(*(check(intent_id) for _, intent_id in page))
+        last_id = page[-1][0]
+
+    logger.info("Reconcile summary: %s", summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--older-than-minutes", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    summary = asyncio.run(
+        reconcile(
+            timedelta(minutes=args.older_than_minutes),
+            args.batch_size,
+            args.concurrency,
+            args.dry_run,
+        )
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
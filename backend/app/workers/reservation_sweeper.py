@@ -0,0 +1,46 @@
+import asyncio
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.inventory_repo import InventoryRepository
+from app.services.order_service import OrderService
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def sweep_expired_reservations(batch_size: int = None) -> int:
+    """
+    Releases expired stock holds in batches until none are left; their
+    unpaid orders are cancelled (and announced) in the same transaction
+    """
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    released = cancelled = 0
+    while True:
+        db = SessionLocal()
+        try:
+            expired = InventoryRepository.release_expired(db, batch_size)
+            cancelled += OrderService.cancel_expired(db, expired)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Reservation sweep failed: %s", e, exc_info=True)
+            break
+        finally:
+            db.close()
+        released += len(expired)
+        if len(expired) < batch_size:
+            break
+    if released:
+        logger.info(
+            "Reservation sweep: released %d expired holds, cancelled %d orders",
+            released,
+            cancelled,
+        )
+    return released
+
+
+async def run_reservation_sweeper():
+    """Background loop started from the app lifespan"""
+    while True:
+        await asyncio.to_thread(sweep_expired_reservations)
+        await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
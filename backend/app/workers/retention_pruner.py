@@ -0,0 +1,54 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.idempotency_repo import IdempotencyRepository
+from app.repositories.payment_payload_repo import PaymentPayloadRepository
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _prune(prune, cutoff: datetime) -> int:
+    """Runs `prune(db, cutoff, batch_size)` in committed batches until it runs dry"""
+    pruned = 0
+    while True:
+        db = SessionLocal()
+        try:
+            count = prune(db, cutoff, settings.RETENTION_PRUNE_BATCH_SIZE)
+            db.commit()
+        finally:
+            db.close()
+        pruned += count
+        if count < settings.RETENTION_PRUNE_BATCH_SIZE:
+            return pruned
+
+
+def prune_expired_keys() -> int:
+    """Drops Idempotency-Key records past IDEMPOTENCY_KEY_TTL_HOURS"""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    pruned = _prune(IdempotencyRepository.prune, cutoff)
+    if pruned:
+        logger.info("Idempotency keys: pruned %d expired records", pruned)
+    return pruned
+
+
+def prune_gateway_payloads() -> int:
+    """Drops raw gateway responses past PAYMENT_PAYLOAD_RETENTION_DAYS (0 keeps them)"""
+    if settings.PAYMENT_PAYLOAD_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.PAYMENT_PAYLOAD_RETENTION_DAYS)
+    pruned = _prune(PaymentPayloadRepository.prune, cutoff)
+    if pruned:
+        logger.info("Gateway payloads: pruned %d expired payloads", pruned)
+    return pruned
+
+
+async def run_retention_pruner():
+    while True:
+        for job in (prune_expired_keys, prune_gateway_payloads):
+            try:
+                await asyncio.to_thread(job)
+            except Exception as e:
+                logger.error("Retention job %s failed: %s", job.__name__, e, exc_info=True)
+        await asyncio.sleep(settings.RETENTION_PRUNE_INTERVAL_SECONDS)
@@ -0,0 +1,105 @@
+"""
+Points stored image URLs (products.image_url, products.image_variants,
+profiles.profile_picture) at the CDN, or back at the bucket with --reverse.
+
+    PUBLIC_ASSET_BASE_URL=https://cdn.example.com python -m app.workers.rewrite_image_urls
+    python -m app.workers.rewrite_image_urls --reverse [--dry-run]
+
+Both bases come from S3Service (AWS_S3_ENDPOINT_URL included). Each id range
+commits on its own and only rows still on the old base match, so an
+interrupted run is simply started again. Objects themselves are unchanged;
+S3Service.key_from_url resolves both forms.
+"""
+import argparse
+import json
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.s3_service import S3Service
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# (table, column, stored as JSON)
+COLUMNS = (
+    ("products", "image_url", False),
+    ("products", "image_variants", True),
+    ("profiles", "profile_picture", False),
+)
+
+
+def _statement(table: str, column: str, is_json: bool):
+    if is_json:
+        value = f"replace({column}::text, :old, :new)::json"
+        match = f"{column}::text LIKE :pattern"
+    else:
+        value = f"(:new || substr({column}, length(:old) + 1))"
+        match = f"{column} LIKE :pattern"
+    return text(
+        f"UPDATE {table} SET {column} = {value} "
+        f"WHERE id > :start AND id <= :stop AND {match}"
+    )
+
+
+def _max_id(table: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(text(f"SELECT max(id) FROM {table}")).scalar() or 0
+    finally:
+        db.close()
+
+
+def _rewrite_batch(statement, params: dict, dry_run: bool) -> int:
+    db = SessionLocal()
+    try:
+        count = db.execute(statement, params).rowcount
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        return count
+    finally:
+        db.close()
+
+
+def rewrite(old: str, new: str, batch_size: int = 5000, dry_run: bool = False) -> dict:
+    summary = {}
+    for table, column, is_json in COLUMNS:
+        statement = _statement(table, column, is_json)
+        pattern = ("%" if is_json else "") + old.replace("_", r"\_") + "%"
+        rewritten = 0
+        for start in range(0, _max_id(table) + 1, batch_size):
+            rewritten += _rewrite_batch(
+                statement,
+                {
+                    "old": old,
+                    "new": new,
+                    "pattern": pattern,
+                    "start": start,
+                    "stop": start + batch_size,
+                },
+                dry_run,
+            )
+        summary[f"{table}.{column}"] = rewritten
+        logger.info("Image URL rewrite: %s.%s rows=%d", table, column, rewritten)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reverse", action="store_true", help="CDN URLs back to the bucket")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if not settings.PUBLIC_ASSET_BASE_URL:
+        parser.error("PUBLIC_ASSET_BASE_URL is not set")
+    origin, cdn = S3Service.origin_url(""), S3Service.public_url("")
+    old, new = (cdn, origin) if args.reverse else (origin, cdn)
+
+    summary = rewrite(old, new, args.batch_size, args.dry_run)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Processes Stripe events stored by /webhooks/stripe. Started from the app
+lifespan, or standalone:
+
+    python -m app.workers.webhook_worker
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.webhook_repo import WebhookRepository
+from app.services.order_service import OrderService
+from app.utils.log_config import get_logger
+
+logger = get_logger(__name__)
+
+# In-process counters, reported next to WebhookRepository.queue_stats()
+stats = {
+    "processed": 0,
+    "retried": 0,
+    "last_lag_seconds": 0.0,  # received -> processed, most recent event
+    "max_lag_seconds": 0.0,
+    "last_batch_at": None,
+}
+
+
+def _process_one(row_id, event_type, payload, attempts, received_at):
+    db = SessionLocal()
+    try:
+        try:
+            ok = OrderService.apply_stripe_event(db, event_type, payload)
+            error = None if ok else "event not applied"
+        except Exception as e:
+            db.rollback()
+            ok, error = False, str(e)
+            logger.error("Webhook event failed: row_id=%s error=%s", row_id, e, exc_info=True)
+
+        if ok:
+            WebhookRepository.mark_done(db, row_id)
+            lag = (datetime.now(timezone.utc) - received_at).total_seconds()
+            stats["processed"] += 1
+            stats["last_lag_seconds"] = round(lag, 3)
+            stats["max_lag_seconds"] = max(stats["max_lag_seconds"], stats["last_lag_seconds"])
+        else:
+            WebhookRepository.mark_retry(db, row_id, attempts, error)
+            stats["retried"] += 1
+        db.commit()
+    finally:
+        db.close()
+
+
+def process_batch(batch_size: int = None) -> int:
+    """Claims one batch (at most one event per payment intent) and applies it"""
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        rows = WebhookRepository.claim_batch(db, batch_size, settings.WEBHOOK_LEASE_SECONDS)
+        db.commit()
+    finally:
+        db.close()
+
+    for row_id, event_type, _, payload, attempts, received_at in rows:
+        _process_one(row_id, event_type, payload, attempts, received_at)
+    stats["last_batch_at"] = time.time()
+    return len(rows)
+
+
+async def run_webhook_worker(worker_id: int = 0):
+    logger.info("Webhook worker %s started", worker_id)
+    while True:
+        try:
+            processed = await asyncio.to_thread(process_batch)
+        except Exception as e:
+            logger.error("Webhook worker %s error: %s", worker_id, e, exc_info=True)
+            processed = 0
+        if processed < settings.WEBHOOK_BATCH_SIZE:
+            await asyncio.sleep(settings.WEBHOOK_POLL_INTERVAL_SECONDS)
+
+
+def prune_processed_events() -> int:
+    """Drops finished events past WEBHOOK_RETENTION_DAYS, in batches"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.WEBHOOK_RETENTION_DAYS)
+    pruned = 0
+    while True:
+        db = SessionLocal()
+        try:
+            count = WebhookRepository.prune(db, cutoff, settings.WEBHOOK_PRUNE_BATCH_SIZE)
+            db.commit()
+        finally:
+            db.close()
+        pruned += count
+        if count < settings.WEBHOOK_PRUNE_BATCH_SIZE:
+            break
+    if pruned:
+        logger.info("Webhook retention: pruned %d events older than %s", pruned, cutoff)
+    return pruned
+
+
+async def run_webhook_pruner():
+    while True:
+        try:
+            await asyncio.to_thread(prune_processed_events)
+        except Exception as e:
+            logger.error("Webhook pruning failed: %s", e, exc_info=True)
+        await asyncio.sleep(settings.WEBHOOK_PRUNE_INTERVAL_SECONDS)
+
+
+async def run_webhook_pool(workers: int = None):
+    workers = workers or settings.WEBHOOK_WORKERS
+    await asyncio.gather(
+        run_webhook_pruner(), *(run_webhook_worker(i) for i in range(workers))
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run_webhook_pool())
@@ -16,7 +16,13 @@ from app.models.orders import (
     PaymentAttempt,
     PaymentAttemptStatus,
     OrderStatus,
+    StockReservation,
+    PaymentGatewayPayload,
 )
+from app.models.outbox import OutboxEvent
+from app.models.webhooks import WebhookEvent
+from app.models.idempotency import IdempotencyRecord
+from app.models.images import ImageObject
 
 
 DATABASE_URL = f"postgresql://{settings.DB_USER}:{quote_plus(settings.DB_PASSWORD)}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
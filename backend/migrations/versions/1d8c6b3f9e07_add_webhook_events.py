@@ -0,0 +1,51 @@
+"""add webhook events
+
+Revision ID: 1d8c6b3f9e07
+Revises: e5f0a7c3d218
+Create Date: 2026-02-10 09:21:33.918402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d8c6b3f9e07'
+down_revision: Union[str, Sequence[str], None] = 'e5f0a7c3d218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('webhook_events',
+    sa.Column('event_id', sa.String(length=100), nullable=False),
+    sa.Column('event_type', sa.String(length=100), nullable=False),
+    sa.Column('intent_id', sa.String(length=100), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'PROCESSING', 'DONE', 'FAILED', name='webhookeventstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    op.create_index(op.f('ix_webhook_events_id'), 'webhook_events', ['id'], unique=False)
+    op.create_index(op.f('ix_webhook_events_intent_id'), 'webhook_events', ['intent_id'], unique=False)
+    op.create_index('ix_webhook_events_status_id', 'webhook_events', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_webhook_events_status_id', table_name='webhook_events')
+    op.drop_index(op.f('ix_webhook_events_intent_id'), table_name='webhook_events')
+    op.drop_index(op.f('ix_webhook_events_id'), table_name='webhook_events')
+    op.drop_table('webhook_events')
+    sa.Enum(name='webhookeventstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,33 @@
+"""add cart item price changed flag
+
+Revision ID: 3f1a9c2e7b40
+Revises: d416be3cdf89
+Create Date: 2026-02-02 18:12:44.310527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2e7b40'
+down_revision: Union[str, Sequence[str], None] = 'd416be3cdf89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cart_items', sa.Column('price_changed', sa.Boolean(), server_default=sa.text('false'), nullable=True))
+    # Re-pricing by product touches every cart holding it
+    op.create_index(op.f('ix_cart_items_product_id'), 'cart_items', ['product_id'], unique=False)
+    op.create_index(op.f('ix_cart_items_cart_id'), 'cart_items', ['cart_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cart_items_cart_id'), table_name='cart_items')
+    op.drop_index(op.f('ix_cart_items_product_id'), table_name='cart_items')
+    op.drop_column('cart_items', 'price_changed')
@@ -0,0 +1,28 @@
+"""add product flash sale flag
+
+Revision ID: 4d9b1e7c3a86
+Revises: b81e4f2d6a57
+Create Date: 2026-02-21 09:41:17.528064
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d9b1e7c3a86'
+down_revision: Union[str, Sequence[str], None] = 'b81e4f2d6a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('flash_sale', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'flash_sale')
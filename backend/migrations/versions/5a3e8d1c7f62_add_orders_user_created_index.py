@@ -0,0 +1,44 @@
+"""add orders user created index
+
+Revision ID: 5a3e8d1c7f62
+Revises: 1d8c6b3f9e07
+Create Date: 2026-02-12 14:08:56.447193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a3e8d1c7f62'
+down_revision: Union[str, Sequence[str], None] = '1d8c6b3f9e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY so the live orders table isn't write-locked during the build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_id_created_at',
+            'orders',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_order_items_order_id'),
+            'order_items',
+            ['order_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
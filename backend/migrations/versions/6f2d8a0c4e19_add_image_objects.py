@@ -0,0 +1,55 @@
+"""add image objects
+
+Revision ID: 6f2d8a0c4e19
+Revises: a3c7e9f1b254
+Create Date: 2026-02-26 11:47:38.096214
+
+Reference counts for S3 images, seeded from the URLs already stored on
+products and profiles.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2d8a0c4e19'
+down_revision: Union[str, Sequence[str], None] = 'a3c7e9f1b254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('image_objects',
+    sa.Column('key', sa.String(length=500), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_index(op.f('ix_image_objects_id'), 'image_objects', ['id'], unique=False)
+    # ImageService.request_variants looks up variants already rendered for a URL
+    op.create_index(op.f('ix_products_image_url'), 'products', ['image_url'], unique=False)
+
+    # Stored URLs are virtual-hosted S3 URLs: the key is everything after the host
+    op.execute("""
+        INSERT INTO image_objects (key, ref_count)
+        SELECT regexp_replace(url, '^https?://[^/]+/', ''), count(*)
+        FROM (
+            SELECT image_url AS url FROM products WHERE image_url IS NOT NULL
+            UNION ALL
+            SELECT profile_picture FROM profiles WHERE profile_picture IS NOT NULL
+        ) refs
+        GROUP BY 1
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_products_image_url'), table_name='products')
+    op.drop_index(op.f('ix_image_objects_id'), table_name='image_objects')
+    op.drop_table('image_objects')
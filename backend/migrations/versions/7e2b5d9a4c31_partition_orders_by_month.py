@@ -0,0 +1,131 @@
+"""partition orders by month
+
+Revision ID: 7e2b5d9a4c31
+Revises: 9c6f2a4b8d15
+Create Date: 2026-02-17 08:52:40.113905
+
+Rebuilds orders, order_items and payment_attempts as tables range-partitioned
+by month on created_at: one partition per month from the oldest row up to
+three months ahead, plus a DEFAULT partition. Data is copied and the old
+tables dropped in the same transaction; sequences are kept so ids continue.
+
+Postgres requires the partition key in every unique constraint, so:
+  * primary keys become (id, created_at)
+  * payment_attempts.external_order_id / idempotency_key lose their unique
+    constraints (kept as plain indexes)
+  * FKs into orders (order_items, payment_attempts, stock_reservations) are
+    dropped and enforced by the application
+
+Run in a maintenance window: the copy holds ACCESS EXCLUSIVE on the tables.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b5d9a4c31'
+down_revision: Union[str, Sequence[str], None] = '9c6f2a4b8d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('orders', 'order_items', 'payment_attempts')
+
+
+def _rebuild(table: str, partitioned: bool) -> None:
+    """Copies `table` into a fresh (non-)partitioned table and swaps it in"""
+    new = f'{table}__new'
+    partition_clause = 'PARTITION BY RANGE (created_at)' if partitioned else ''
+    op.execute(f'UPDATE {table} SET created_at = now() WHERE created_at IS NULL')
+    op.execute(f'CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) {partition_clause}')
+    op.execute(f'ALTER TABLE {new} ALTER COLUMN created_at SET NOT NULL')
+
+    if partitioned:
+        # Monthly partitions covering existing data and the next 3 months
+        op.execute(f"""
+            DO $$
+            DECLARE m date;
+            BEGIN
+                FOR m IN
+                    SELECT generate_series(
+                        date_trunc('month', coalesce((SELECT min(created_at) FROM {table}), now())),
+                        date_trunc('month', now()) + interval '3 months',
+                        interval '1 month'
+                    )::date
+                LOOP
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF {new} FOR VALUES FROM (%L) TO (%L)',
+                        '{table}_' || to_char(m, '"y"YYYY"m"MM'),
+                        m,
+                        (m + interval '1 month')::date
+                    );
+                END LOOP;
+            END $$;
+        """)
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {new} DEFAULT')
+
+    op.execute(f'INSERT INTO {new} SELECT * FROM {table}')
+
+    # The old column owns the id sequence; detach it so DROP doesn't take it along
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.execute(f'DROP TABLE {table}')
+    op.execute(f'ALTER TABLE {new} RENAME TO {table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for child, fk in (
+        ('order_items', 'order_items_order_id_fkey'),
+        ('payment_attempts', 'payment_attempts_order_id_fkey'),
+        ('stock_reservations', 'stock_reservations_order_id_fkey'),
+    ):
+        op.execute(f'ALTER TABLE {child} DROP CONSTRAINT IF EXISTS {fk}')
+
+    for table in TABLES:
+        _rebuild(table, partitioned=True)
+
+    op.create_primary_key('orders_pkey', 'orders', ['id', 'created_at'])
+    op.create_foreign_key(None, 'orders', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'orders', 'addresses', ['address_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_orders_id'), 'orders', ['id'], unique=False)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+    op.create_primary_key('order_items_pkey', 'order_items', ['id', 'created_at'])
+    op.create_foreign_key(None, 'order_items', 'products', ['product_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_order_items_id'), 'order_items', ['id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+    op.create_primary_key('payment_attempts_pkey', 'payment_attempts', ['id', 'created_at'])
+    op.create_index(op.f('ix_payment_attempts_id'), 'payment_attempts', ['id'], unique=False)
+    op.create_index(op.f('ix_payment_attempts_order_id'), 'payment_attempts', ['order_id'], unique=False)
+    op.create_index(op.f('ix_payment_attempts_external_order_id'), 'payment_attempts', ['external_order_id'], unique=False)
+    op.create_index(op.f('ix_payment_attempts_idempotency_key'), 'payment_attempts', ['idempotency_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived (detached/dropped) partitions are not restored
+    for table in TABLES:
+        _rebuild(table, partitioned=False)
+
+    op.create_primary_key('orders_pkey', 'orders', ['id'])
+    op.create_foreign_key(None, 'orders', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'orders', 'addresses', ['address_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_orders_id'), 'orders', ['id'], unique=False)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+    op.create_primary_key('order_items_pkey', 'order_items', ['id'])
+    op.create_foreign_key('order_items_order_id_fkey', 'order_items', 'orders', ['order_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'order_items', 'products', ['product_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_order_items_id'), 'order_items', ['id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+    op.create_primary_key('payment_attempts_pkey', 'payment_attempts', ['id'])
+    op.create_foreign_key('payment_attempts_order_id_fkey', 'payment_attempts', 'orders', ['order_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_payment_attempts_id'), 'payment_attempts', ['id'], unique=False)
+    op.create_index(op.f('ix_payment_attempts_external_order_id'), 'payment_attempts', ['external_order_id'], unique=True)
+    op.create_unique_constraint('payment_attempts_idempotency_key_key', 'payment_attempts', ['idempotency_key'])
+
+    op.create_foreign_key('stock_reservations_order_id_fkey', 'stock_reservations', 'orders', ['order_id'], ['id'], ondelete='CASCADE')
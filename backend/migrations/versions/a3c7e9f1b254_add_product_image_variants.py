@@ -0,0 +1,28 @@
+"""add product image variants
+
+Revision ID: a3c7e9f1b254
+Revises: 4d9b1e7c3a86
+Create Date: 2026-02-24 16:20:05.771893
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c7e9f1b254'
+down_revision: Union[str, Sequence[str], None] = '4d9b1e7c3a86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'image_variants')
@@ -0,0 +1,134 @@
+"""compact gateway response
+
+Revision ID: b81e4f2d6a57
+Revises: 7e2b5d9a4c31
+Create Date: 2026-02-19 14:06:51.402337
+
+Replaces payment_attempts.gateway_response (JSON) with typed gateway_status,
+client_secret and gateway_error columns. Raw responses move, compressed, to
+payment_gateway_payloads. Existing rows are backfilled in batches of
+BATCH_SIZE, keyed on id.
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.compression import compress_json, decompress_json
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81e4f2d6a57'
+down_revision: Union[str, Sequence[str], None] = '7e2b5d9a4c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _batches(conn, query: str):
+    """Yields id-ordered batches of rows from `query` (which filters on id > :after)"""
+    after = 0
+    while True:
+        rows = conn.execute(sa.text(query), {'after': after, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payment_attempts', sa.Column('gateway_status', sa.String(length=50), nullable=True))
+    op.add_column('payment_attempts', sa.Column('client_secret', sa.String(length=255), nullable=True))
+    op.add_column('payment_attempts', sa.Column('gateway_error', sa.Text(), nullable=True))
+    op.create_table('payment_gateway_payloads',
+    sa.Column('attempt_id', sa.Integer(), nullable=False),
+    sa.Column('codec', sa.String(length=10), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payment_gateway_payloads_id'), 'payment_gateway_payloads', ['id'], unique=False)
+    op.create_index(op.f('ix_payment_gateway_payloads_attempt_id'), 'payment_gateway_payloads', ['attempt_id'], unique=False)
+    op.create_index('ix_payment_gateway_payloads_created_at', 'payment_gateway_payloads', ['created_at'], unique=False)
+
+    conn = op.get_bind()
+    update = sa.text(
+        'UPDATE payment_attempts SET gateway_status = :status, '
+        'client_secret = :client_secret, gateway_error = :error WHERE id = :id'
+    )
+    insert = sa.text(
+        'INSERT INTO payment_gateway_payloads (attempt_id, codec, payload, created_at) '
+        'VALUES (:attempt_id, :codec, :payload, :created_at)'
+    )
+    for rows in _batches(
+        conn,
+        'SELECT id, created_at, gateway_response FROM payment_attempts '
+        'WHERE id > :after AND gateway_response IS NOT NULL ORDER BY id LIMIT :limit',
+    ):
+        updates, payloads = [], []
+        for row in rows:
+            response = row.gateway_response
+            if not isinstance(response, dict):
+                continue
+            error = response.get('error')
+            updates.append({
+                'id': row.id,
+                'status': response.get('status'),
+                'client_secret': response.get('client_secret'),
+                'error': error if isinstance(error, str) else None,
+            })
+            if set(response) != {'error'}:
+                codec, blob = compress_json(response)
+                payloads.append({
+                    'attempt_id': row.id, 'codec': codec, 'payload': blob,
+                    'created_at': row.created_at,
+                })
+        if updates:
+            conn.execute(update, updates)
+        if payloads:
+            conn.execute(insert, payloads)
+
+    op.drop_column('payment_attempts', 'gateway_response')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('payment_attempts', sa.Column('gateway_response', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    update = sa.text('UPDATE payment_attempts SET gateway_response = CAST(:response AS json) WHERE id = :id')
+    for rows in _batches(
+        conn,
+        'SELECT a.id, a.gateway_status, a.client_secret, a.gateway_error, p.codec, p.payload '
+        'FROM payment_attempts a LEFT JOIN LATERAL ('
+        '  SELECT codec, payload FROM payment_gateway_payloads '
+        '  WHERE attempt_id = a.id ORDER BY id DESC LIMIT 1'
+        ') p ON true '
+        'WHERE a.id > :after AND (a.gateway_status IS NOT NULL OR a.gateway_error IS NOT NULL) '
+        'ORDER BY a.id LIMIT :limit',
+    ):
+        updates = []
+        for row in rows:
+            if row.payload is not None:
+                response = decompress_json(row.codec, bytes(row.payload))
+            elif row.gateway_error is not None:
+                response = {'error': row.gateway_error}
+            else:
+                # Payload pruned or never stored: keep what the typed columns hold
+                response = {'status': row.gateway_status, 'client_secret': row.client_secret}
+            updates.append({'id': row.id, 'response': json.dumps(response)})
+        if updates:
+            conn.execute(update, updates)
+
+    op.drop_index('ix_payment_gateway_payloads_created_at', table_name='payment_gateway_payloads')
+    op.drop_index(op.f('ix_payment_gateway_payloads_attempt_id'), table_name='payment_gateway_payloads')
+    op.drop_index(op.f('ix_payment_gateway_payloads_id'), table_name='payment_gateway_payloads')
+    op.drop_table('payment_gateway_payloads')
+    op.drop_column('payment_attempts', 'gateway_error')
+    op.drop_column('payment_attempts', 'client_secret')
+    op.drop_column('payment_attempts', 'gateway_status')
@@ -0,0 +1,30 @@
+"""add idempotency claimed_at
+
+Revision ID: e3a9c5d7f284
+Revises: 6f2d8a0c4e19
+Create Date: 2026-03-04 14:08:51.312476
+
+Lease timestamp for in-progress Idempotency-Key claims, so a claim left by
+a crashed worker can be taken over instead of blocking the key until its TTL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5d7f284'
+down_revision: Union[str, Sequence[str], None] = '6f2d8a0c4e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('idempotency_keys', sa.Column('claimed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('idempotency_keys', 'claimed_at')
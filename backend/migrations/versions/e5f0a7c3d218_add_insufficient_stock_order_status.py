@@ -0,0 +1,31 @@
+"""add insufficient stock order status
+
+Revision ID: e5f0a7c3d218
+Revises: c47e91d0b5a2
+Create Date: 2026-02-08 12:44:17.205931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f0a7c3d218'
+down_revision: Union[str, Sequence[str], None] = 'c47e91d0b5a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ADD VALUE can't run inside a transaction block on older Postgres
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE orderstatus ADD VALUE IF NOT EXISTS 'INSUFFICIENT_STOCK'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Postgres can't drop enum values; park affected orders as cancelled instead
+    op.execute("UPDATE orders SET order_status = 'CANCELLED' WHERE order_status = 'INSUFFICIENT_STOCK'")
@@ -0,0 +1,101 @@
+"""
+Tests run against SQLite; Postgres-only SQL (pg_notify, UPDATE ... FROM
+VALUES) is either registered as a SQLite function here or stubbed per test.
+"""
+import os
+
+# Settings are read at import time; the real .env isn't needed for tests
+for name, value in {
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_HOST": "localhost",
+    "DB_NAME": "test",
+    "SECRET_KEY": "test",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "AWS_REGION": "us-east-1",
+    "AWS_S3_BUCKET_NAME": "test-bucket",
+    "STRIPE_SECRET_KEY": "sk_test_123",
+    "STRIPE_WEBHOOK_SECRET": "whsec_test",
+    "LOG_FORMAT": "text",
+}.items():
+    os.environ.setdefault(name, value)
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+import stripe
+import uvicorn
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import Base
+import app.models.ecommerce  # noqa: F401  (registers the tables)
+import app.models.idempotency  # noqa: F401
+import app.models.images  # noqa: F401
+import app.models.orders  # noqa: F401
+import app.models.outbox  # noqa: F401
+import app.models.product  # noqa: F401
+import app.models.user  # noqa: F401
+import app.models.webhooks  # noqa: F401
+from tools import fake_stripe
+
+
+@pytest.fixture
+def notifications():
+    """Payloads passed to pg_notify, decoded"""
+    return []
+
+
+@pytest.fixture
+def engine(notifications):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function(
+            "pg_notify", 2, lambda channel, payload: notifications.append(json.loads(payload))
+        )
+
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def stripe_server(monkeypatch):
+    """tools/fake_stripe.py on a free local port, with stripe pointed at it; yields its intents"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    monkeypatch.setattr(fake_stripe, "LATENCY", 0)
+    for store in ("intents", "refunds", "idempotency"):
+        monkeypatch.setattr(fake_stripe, store, {})
+    server = uvicorn.Server(uvicorn.Config(fake_stripe.app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    monkeypatch.setattr(stripe, "api_base", "http://127.0.0.1:%d" % sock.getsockname()[1])
+    yield fake_stripe.intents
+    server.should_exit = True
+    thread.join()
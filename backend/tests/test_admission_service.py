@@ -0,0 +1,46 @@
+import asyncio
+
+from app.models.ecommerce import Cart, CartItem
+from app.models.product import Product
+from app.services import admission_service
+from app.services.admission_service import FlashSaleAdmission
+
+
+def test_cart_lookup_only_when_items_may_hold_flash_sale(db, session_factory, monkeypatch):
+    db.add_all(
+        [
+            Product(id=1, brand="Acme", model_name="Sale", price=10.0, stock=5, seller_id=1, flash_sale=True),
+            Product(id=2, brand="Acme", model_name="Plain", price=10.0, stock=5, seller_id=1),
+            Cart(id=1, user_id=1),
+            CartItem(id=1, cart_id=1, product_id=1, quantity=1),
+            CartItem(id=2, cart_id=1, product_id=2, quantity=1),
+        ]
+    )
+    db.commit()
+    monkeypatch.setattr(admission_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(admission_service, "_budgets", {})
+    lookups = []
+    cart_quantities = admission_service._cart_quantities
+
+    def recording(user_id, cart_item_ids, product_ids):
+        lookups.append(cart_item_ids)
+        return cart_quantities(user_id, cart_item_ids, product_ids)
+
+    monkeypatch.setattr(admission_service, "_cart_quantities", recording)
+
+    async def checkout(cart_item_ids):
+        async with FlashSaleAdmission.admit(1, cart_item_ids):
+            pass
+
+    async def scenario():
+        await FlashSaleAdmission.refresh()
+        await checkout([2])  # No flash-sale product: no cart lookup
+        # Added after the refresh: still seen, nothing is cached per cart item
+        db.add(CartItem(id=3, cart_id=1, product_id=1, quantity=1))
+        db.commit()
+        await checkout([3])
+        await checkout([2, 3])
+
+    asyncio.run(scenario())
+    assert lookups == [[3], [2, 3]]
+    assert admission_service._budgets[1].tokens == 3  # Two units admitted
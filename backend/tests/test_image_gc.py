@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.images import ImageObject
+from app.models.product import Product
+from app.services.s3_service import S3Service
+from app.workers import image_gc
+
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=30)
+
+
+class FakeS3:
+    def __init__(self, objects: dict):
+        self.objects = objects  # key -> LastModified
+        self.deleted = []
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        yield {
+            "Contents": [
+                {"Key": key, "LastModified": modified}
+                for key, modified in self.objects.items()
+                if key.startswith(Prefix)
+            ]
+        }
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.deleted.append(obj["Key"])
+            del self.objects[obj["Key"]]
+        return {}
+
+
+def _product(product_id: int, key: str) -> Product:
+    return Product(
+        id=product_id,
+        brand="Acme",
+        model_name=key,
+        price=10.0,
+        stock=1,
+        seller_id=1,
+        image_url=S3Service.public_url(key),
+    )
+
+
+def test_deleted_products_image_is_collected(db, session_factory, monkeypatch):
+    """A deleted product never releases its ref_count; its image is still collected"""
+    db.add_all(
+        [
+            _product(1, "products/gone.jpg"),
+            _product(2, "products/kept.jpg"),
+            # Acquired and never released (the seller cascade bypasses release)
+            ImageObject(key="products/gone.jpg", ref_count=1, updated_at=LONG_AGO),
+            ImageObject(key="products/kept.jpg", ref_count=1, updated_at=LONG_AGO),
+            # Orphaned, but a dedup upload just stamped it
+            ImageObject(key="products/fresh.jpg", ref_count=0, updated_at=datetime.now(timezone.utc)),
+        ]
+    )
+    db.commit()
+    db.delete(db.get(Product, 1))
+    db.commit()
+
+    s3 = FakeS3(
+        {
+            "products/gone.jpg": LONG_AGO,
+            "products/kept.jpg": LONG_AGO,
+            "products/fresh.jpg": LONG_AGO,
+            "products/unknown.jpg": LONG_AGO,  # No row: adopted, then collected
+        }
+    )
+    monkeypatch.setattr(image_gc, "s3_client", s3)
+    monkeypatch.setattr(image_gc, "SessionLocal", session_factory)
+
+    summary = image_gc.collect(timedelta(hours=24))
+
+    assert sorted(s3.deleted) == ["products/gone.jpg", "products/unknown.jpg"]
+    assert summary["deleted"] == 2
+    assert sorted(key for (key,) in db.query(ImageObject.key)) == [
+        "products/fresh.jpg",
+        "products/kept.jpg",
+    ]
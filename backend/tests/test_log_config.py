@@ -0,0 +1,69 @@
+import logging
+import queue
+
+from app.core.config import settings
+from app.utils import log_config
+
+
+class CountingFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self.seen = 0
+
+    def filter(self, record):
+        self.seen += 1
+        return True
+
+
+def _handler(monkeypatch):
+    handler = log_config.DroppingQueueHandler(queue.Queue())
+    counting = CountingFilter()
+    handler.addFilter(counting)  # Stands in for SamplingFilter, which runs first
+    handler.addFilter(log_config.RequestContextFilter())
+    monkeypatch.setattr(log_config, "_queue_handler", handler)
+    logger = logging.getLogger("test_log_config")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [handler]
+    return handler, counting, logger
+
+
+def _drain(handler) -> list[str]:
+    messages = []
+    while not handler.queue.empty():
+        messages.append(handler.queue.get_nowait().msg)
+    return messages
+
+
+def test_held_records_are_flushed_without_refiltering(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_SUCCESS_SAMPLE_RATE", 0.0)  # Hold every request
+    handler, counting, logger = _handler(monkeypatch)
+
+    token = log_config.begin_request("req-1")
+    logger.info("one")
+    logger.info("two")
+    assert _drain(handler) == []
+    log_config.end_request(token, keep=True)
+
+    assert _drain(handler) == ["one", "two"]
+    assert counting.seen == 2  # Sampled once, when logged
+
+    token = log_config.begin_request("req-2")
+    logger.info("three")
+    logger.error("boom")  # Keeps the request: earlier records go out first
+    log_config.end_request(token, keep=False)
+    assert _drain(handler) == ["three", "boom"]
+    assert counting.seen == 4
+
+
+def test_held_records_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_SUCCESS_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "LOG_HELD_RECORDS_MAX", 3)
+    handler, _, logger = _handler(monkeypatch)
+
+    token = log_config.begin_request("stream")
+    for i in range(10):
+        logger.info("tick %d", i)
+    log_config.end_request(token, keep=True)
+
+    assert _drain(handler) == ["tick 7", "tick 8", "tick 9"]
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.models.orders import (
+    Order,
+    OrderItem,
+    OrderStatus,
+    PaymentAttempt,
+    PaymentAttemptStatus,
+)
+from app.models.outbox import OutboxEvent
+from app.models.product import Product
+from app.repositories.inventory_repo import InventoryRepository
+from app.services.order_service import OrderService
+from app.services.payment_service import PaymentService
+
+
+CREATED = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _paid_order(db, stock=5, quantity=2):
+    product = Product(id=1, brand="Acme", model_name="One", price=10.0, stock=stock, seller_id=1)
+    order = Order(id=1, created_at=CREATED, user_id=1, total_amount=10.0 * quantity)
+    item = OrderItem(
+        id=1,
+        created_at=CREATED,
+        order_id=1,
+        product_id=1,
+        quantity=quantity,
+        product_name_snapshot="Acme One",
+        price_per_unit=10.0,
+    )
+    attempt = PaymentAttempt(
+        id=1,
+        created_at=CREATED,
+        order_id=1,
+        external_order_id="pi_test",
+        amount=10.0 * quantity,
+        status=PaymentAttemptStatus.PROCESSING,
+    )
+    db.add_all([product, order, item, attempt])
+    db.commit()
+
+
+def test_insufficient_stock_still_records_payment(db, notifications, monkeypatch):
+    """The not-deducted branch rolls back its savepoint but keeps the SUCCESS statuses"""
+    _paid_order(db)
+    calls = []
+
+    def short_deduct(db, quantities, from_reserved=False):
+        # Matches some rows, then reports the shortfall: the savepoint must undo it
+        calls.append(quantities)
+        db.execute(update(Product).values(stock=Product.stock - 1))
+        return False
+
+    monkeypatch.setattr(InventoryRepository, "deduct", short_deduct)
+
+    assert OrderService.finalize_payment_success(db, "pi_test") is True
+    db.expire_all()
+
+    order = db.get(Order, (1, CREATED))
+    attempt = db.get(PaymentAttempt, (1, CREATED))
+    assert order.order_status == OrderStatus.INSUFFICIENT_STOCK
+    assert order.payment_status == PaymentAttemptStatus.SUCCESS
+    assert attempt.status == PaymentAttemptStatus.SUCCESS
+    assert db.get(Product, 1).stock == 5
+    assert notifications[-1]["payment_status"] == PaymentAttemptStatus.SUCCESS.value
+
+    refunds = db.query(OutboxEvent).filter_by(kind=PaymentService.REFUND).all()
+    assert [event.payload["intent_id"] for event in refunds] == ["pi_test"]
+
+    # Redelivery: the attempt's SUCCESS status short-circuits before any deduction
+    assert OrderService.finalize_payment_success(db, "pi_test") is True
+    assert len(calls) == 1
+    assert db.get(Order, (1, CREATED)).order_status == OrderStatus.INSUFFICIENT_STOCK
+    assert db.query(OutboxEvent).filter_by(kind=PaymentService.REFUND).count() == 1
+
+
+def test_refund_event_refunds_the_intent(db, stripe_server):
+    """The queued refund goes to Stripe once and is recorded on the attempt"""
+    _paid_order(db)
+    stripe_server["pi_test"] = {"id": "pi_test", "object": "payment_intent", "amount": 2000}
+    order = db.get(Order, (1, CREATED))
+    PaymentService.request_refund(db, order, db.get(PaymentAttempt, (1, CREATED)))
+    db.commit()
+    payload = db.query(OutboxEvent).filter_by(kind=PaymentService.REFUND).one().payload
+
+    refund = asyncio.run(PaymentService.refund(payload))
+    assert asyncio.run(PaymentService.refund(payload)).id == refund.id  # Idempotent retry
+    PaymentService.record_refund(db, payload, refund)
+    db.commit()
+
+    assert refund.payment_intent == "pi_test" and refund.amount == 2000
+    assert db.get(PaymentAttempt, (1, CREATED)).gateway_status == "refund_succeeded"
+
+
+def test_intent_created_bounds_the_attempt_lookup(db, notifications, monkeypatch):
+    """Stripe's creation time limits the attempt (and order) lookup to nearby partitions"""
+    _paid_order(db)
+    deducted = []
+    monkeypatch.setattr(
+        InventoryRepository,
+        "deduct",
+        lambda db, quantities, from_reserved=False: deducted.append(quantities) or True,
+    )
+    long_after = int((CREATED + timedelta(days=3)).timestamp())
+    assert OrderService.finalize_payment_success(db, "pi_test", long_after) is False
+
+    just_after = int((CREATED + timedelta(seconds=5)).timestamp())
+    assert OrderService.finalize_payment_success(db, "pi_test", just_after) is True
+    db.expire_all()
+    assert db.get(Order, (1, CREATED)).order_status == OrderStatus.CONFIRMED
+    assert deducted == [{1: 2}]
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import stripe
+
+from app.models.orders import (
+    Order,
+    OrderStatus,
+    PaymentAttempt,
+    PaymentAttemptStatus,
+)
+from app.workers import reconcile_payments
+
+CREATED = (datetime.now(timezone.utc) - timedelta(hours=2)).replace(microsecond=0)
+
+
+def _processing_order(db, order_id: int, intent_id: str):
+    db.add_all(
+        [
+            Order(id=order_id, created_at=CREATED, user_id=1, total_amount=10.0),
+            PaymentAttempt(
+                id=order_id,
+                created_at=CREATED,
+                order_id=order_id,
+                external_order_id=intent_id,
+                amount=10.0,
+                status=PaymentAttemptStatus.PROCESSING,
+            ),
+        ]
+    )
+
+
+def _intent(intent_id: str, status: str, **extra) -> dict:
+    return {
+        "id": intent_id,
+        "object": "payment_intent",
+        "status": status,
+        "created": int(CREATED.timestamp()) + 1,
+        **extra,
+    }
+
+
+def test_reconcile_against_fake_stripe(db, session_factory, stripe_server, monkeypatch):
+    stripe_server["pi_paid"] = _intent("pi_paid", "succeeded")
+    stripe_server["pi_declined"] = _intent(
+        "pi_declined", "requires_payment_method", last_payment_error={"code": "card_declined"}
+    )
+    stripe_server["pi_open"] = _intent("pi_open", "requires_payment_method")
+    for order_id, intent_id in enumerate(("pi_paid", "pi_declined", "pi_open", "pi_gone"), 1):
+        _processing_order(db, order_id, intent_id)
+    db.commit()
+    monkeypatch.setattr(reconcile_payments, "SessionLocal", session_factory)
+
+    # An unknown intent is a 404 with Stripe's error envelope
+    with pytest.raises(stripe.error.InvalidRequestError):
+        stripe.PaymentIntent.retrieve("pi_gone")
+
+    summary = asyncio.run(reconcile_payments.reconcile(concurrency=1))
+
+    assert summary == {
+        "scanned": 4,
+        "succeeded": 1,
+        "failed": 1,
+        "still_pending": 1,
+        "errors": 1,
+    }
+    db.expire_all()
+    expected = {
+        1: (OrderStatus.CONFIRMED, PaymentAttemptStatus.SUCCESS),
+        2: (OrderStatus.CANCELLED, PaymentAttemptStatus.FAILED),
+        3: (OrderStatus.INITIATED, PaymentAttemptStatus.PROCESSING),
+        4: (OrderStatus.INITIATED, PaymentAttemptStatus.PROCESSING),
+    }
+    for order_id, (order_status, attempt_status) in expected.items():
+        assert db.get(Order, (order_id, CREATED)).order_status == order_status
+        assert db.get(PaymentAttempt, (order_id, CREATED)).status == attempt_status
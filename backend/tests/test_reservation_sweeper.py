@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.models.orders import (
+    Order,
+    OrderStatus,
+    ReservationStatus,
+    StockReservation,
+)
+from app.models.product import Product
+from app.repositories.inventory_repo import InventoryRepository
+from app.workers import reservation_sweeper
+
+CREATED = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+EXPIRES = CREATED + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+
+
+def test_sweep_cancels_unpaid_orders(db, session_factory, notifications, monkeypatch):
+    """Expired holds are released and their INITIATED orders cancelled, with an event"""
+    db.add_all(
+        [
+            Product(id=1, brand="Acme", model_name="One", price=10.0, stock=5, reserved=3, seller_id=1),
+            Order(id=1, created_at=CREATED, user_id=1, total_amount=20.0),
+            # Settled while its hold was still listed: left alone
+            Order(
+                id=2,
+                created_at=CREATED,
+                user_id=1,
+                total_amount=10.0,
+                order_status=OrderStatus.CONFIRMED,
+            ),
+        ]
+    )
+    db.add_all(
+        [
+            StockReservation(id=1, order_id=1, product_id=1, quantity=2, expires_at=EXPIRES),
+            StockReservation(id=2, order_id=2, product_id=1, quantity=1, expires_at=EXPIRES),
+        ]
+    )
+    db.commit()
+    unreserved = []
+    monkeypatch.setattr(InventoryRepository, "_unreserve", lambda db, q: unreserved.append(q))
+    monkeypatch.setattr(reservation_sweeper, "SessionLocal", session_factory)
+
+    assert reservation_sweeper.sweep_expired_reservations(batch_size=10) == 2
+
+    db.expire_all()
+    assert unreserved == [{1: 3}]
+    assert db.get(Order, (1, CREATED)).order_status == OrderStatus.CANCELLED
+    assert db.get(Order, (2, CREATED)).order_status == OrderStatus.CONFIRMED
+    assert {r.status for r in db.query(StockReservation)} == {ReservationStatus.RELEASED}
+    assert notifications == [
+        {"order_id": 1, "order_status": "cancelled", "payment_status": "initiated"}
+    ]
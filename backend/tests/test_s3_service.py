@@ -0,0 +1,31 @@
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.services.s3_service import S3Service
+
+
+def test_key_from_url():
+    assert S3Service.key_from_url(S3Service.public_url("products/a.jpg")) == "products/a.jpg"
+    assert S3Service.key_from_url(S3Service.origin_url("profiles/b.png")) == "profiles/b.png"
+    assert S3Service.key_from_url("https://elsewhere.example/products/c.webp") == "products/c.webp"
+    # Nothing after the base/host: no key, not an IndexError
+    assert S3Service.key_from_url(S3Service.public_url("")) is None
+    assert S3Service.key_from_url("https://elsewhere.example") is None
+
+
+def _upload(filename: str, content_type: str) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(b"data"),
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def test_upload_extension_comes_from_the_content_type():
+    assert S3Service._prepare_upload(_upload("photo.html", "image/png"), 5) == ("png", 4)
+    with pytest.raises(HTTPException) as exc:
+        S3Service._prepare_upload(_upload("page.html", "text/html"), 5)
+    assert exc.value.status_code == 415
@@ -0,0 +1,61 @@
+"""
+Checkout Stripe-phase throughput against tools/fake_stripe.py.
+
+    uvicorn tools.fake_stripe:app --port 12111 &
+    STRIPE_API_BASE=http://127.0.0.1:12111 python -m tools.bench_checkout -n 200 -c 50
+
+Compares the old pattern (blocking stripe call on the event loop) with
+StripeService.create_payment_intent_async (dedicated executor). Needs the
+usual backend .env so app settings load.
+"""
+import argparse
+import asyncio
+import time
+import stripe
+from app.services.stripe_service import StripeService
+
+
+async def _blocking(i: int):
+    # What initiate_checkout used to do: a sync call inside async def
+    stripe.PaymentIntent.create(
+        amount=1000, currency="usd", idempotency_key=f"bench-blocking-{time.time()}-{i}"
+    )
+
+
+async def _executor(i: int):
+    await StripeService.create_payment_intent_async(
+        amount=10.0,
+        order_id=i,
+        user_email="bench@example.com",
+        idempotency_key=f"bench-executor-{time.time()}-{i}",
+    )
+
+
+async def _run(fn, total: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await fn(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    for name, fn in (("blocking", _blocking), ("executor", _executor)):
+        elapsed = asyncio.run(_run(fn, args.requests, args.concurrency))
+        print(
+            f"{name:>9}: {args.requests} intents in {elapsed:.2f}s "
+            f"({args.requests / elapsed:.1f}/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
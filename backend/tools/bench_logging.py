@@ -0,0 +1,97 @@
+"""
+Per-request logging cost seen by the caller (event loop / request thread).
+
+    python -m tools.bench_logging -n 5000 --gap-ms 1
+
+"sync" is the old setup: RotatingFileHandler + StreamHandler called inline.
+"queue" is app.utils.log_config: DroppingQueueHandler in front of the same
+handlers on a QueueListener thread. "queue+levels" also applies the default
+LOG_LEVELS demotion of repository loggers. Each simulated request logs three
+repository lines and one access line. Needs the usual backend .env so app
+settings load; output goes to a temp dir and /dev/null.
+"""
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from app.utils.log_config import DroppingQueueHandler, DrainingQueueListener
+
+
+def _handlers(log_dir: str) -> list[logging.Handler]:
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "bench.log"), maxBytes=5 * 1024 * 1024, backupCount=5
+    )
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+def _request(root: logging.Logger, repo: logging.Logger, i: int):
+    repo.info("UserRepository.get_by_email: email=%s", f"user{i}@example.com")
+    repo.info("ProductRepository.search_products: brand=%s ram=%s", ["Acme"], [8])
+    repo.info("ProductRepository.search_products: found %d products", 20)
+    root.info("%s %s %s | %s | %.2fms", "GET", "/api/v1/products/search", 200, "127.0.0.1", 3.2)
+
+
+def _run(
+    name: str, requests: int, gap: float, log_dir: str, use_queue: bool, repo_level: int
+) -> float:
+    root = logging.getLogger(f"bench.{name}")
+    root.propagate = False
+    root.setLevel(logging.INFO)
+    repo = root.getChild("app.repositories")
+    repo.setLevel(repo_level)
+
+    listener = None
+    if use_queue:
+        handler = DroppingQueueHandler(queue.Queue(maxsize=10_000))
+        root.addHandler(handler)
+        listener = DrainingQueueListener(
+            handler.queue, *_handlers(log_dir), respect_handler_level=True
+        )
+        listener.start()
+    else:
+        for handler in _handlers(log_dir):
+            root.addHandler(handler)
+
+    # Only the logging calls are timed; the gap stands in for the request's own work
+    elapsed = 0.0
+    for i in range(requests):
+        start = time.perf_counter()
+        _request(root, repo, i)
+        elapsed += time.perf_counter() - start
+        time.sleep(gap)
+
+    if listener:
+        listener.stop()
+        dropped = root.handlers[0].dropped
+    else:
+        dropped = 0
+    for handler in root.handlers:
+        handler.close()
+    print(f"{name:>13}: {elapsed / requests * 1e6:7.1f} us/request  (dropped {dropped})")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--requests", type=int, default=5_000)
+    parser.add_argument("--gap-ms", type=float, default=1.0, help="Pause between requests")
+    args = parser.parse_args()
+
+    gap = args.gap_ms / 1000
+    with tempfile.TemporaryDirectory() as log_dir:
+        _run("sync", args.requests, gap, log_dir, use_queue=False, repo_level=logging.INFO)
+        _run("queue", args.requests, gap, log_dir, use_queue=True, repo_level=logging.INFO)
+        _run(
+            "queue+levels", args.requests, gap, log_dir, use_queue=True, repo_level=logging.WARNING
+        )
+
+
+if __name__ == "__main__":
+    main()
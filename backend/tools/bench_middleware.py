@@ -0,0 +1,146 @@
+"""
+Per-request cost of the request middleware on a trivial route.
+
+    python -m tools.bench_middleware -n 20000
+
+"function" is the old main.py setup: log_requests and exception_handler as
+two @app.middleware("http") layers. "asgi" is app.core.middleware.RequestMiddleware
+doing the same work (request id, access log, metrics) in one raw ASGI layer.
+"none" is the bare app. Requests are driven straight through the ASGI
+callable, so no server or socket time is included. App loggers are raised
+to WARNING unless --with-logging, which leaves only the middleware itself in
+the measurement. Needs the usual backend .env so app settings load.
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from fastapi import FastAPI, Request
+from app.core.config import settings
+from app.core.middleware import RequestMiddleware, _access_fields
+from app.utils.log_config import logger, begin_request, end_request
+from app.utils.metrics import (
+    DB_REQUEST_DURATION,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    begin_db_timing,
+    end_db_timing,
+)
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "query_string": b"",
+    "root_path": "",
+    "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("bench", 80),
+}
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def _function_middleware_app() -> FastAPI:
+    app = _app()
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+        token = begin_request(request_id)
+        db_token = begin_db_timing()
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status, keep = 500, True
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            duration_ms = (time.perf_counter() - start) * 1000
+            keep = status >= 500 or duration_ms >= settings.LOG_SLOW_REQUEST_MS
+            logger.info(
+                "%s %s %s | %.2fms",
+                request.method,
+                request.url.path,
+                status,
+                duration_ms,
+                extra=_access_fields(request.scope, status, duration_ms),
+            )
+            response.headers["X-Request-ID"] = request_id
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = request.scope["route"].path
+            HTTP_REQUESTS.inc(request.method, route, status)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, request.method, route, status)
+            DB_REQUEST_DURATION.observe(end_db_timing(db_token), request.method, route)
+            end_request(token, keep)
+
+    @app.middleware("http")
+    async def exception_handler(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            logger.critical("Uncaught exception", exc_info=True)
+            raise
+
+    return app
+
+
+def _asgi_middleware_app() -> FastAPI:
+    app = _app()
+    app.add_middleware(RequestMiddleware)
+    return app
+
+
+async def _run(name: str, app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(500):  # Warm up; builds the middleware stack
+        await app(dict(SCOPE), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(SCOPE), receive, send)
+    per_request = (time.perf_counter() - start) / requests
+    print(f"{name:>9}: {per_request * 1e6:7.1f} us/request")
+    return per_request
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--requests", type=int, default=20_000)
+    parser.add_argument("--with-logging", action="store_true", help="Keep INFO access lines")
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logger.setLevel(logging.WARNING)
+
+    bare = await _run("none", _app(), args.requests)
+    function = await _run("function", _function_middleware_app(), args.requests)
+    asgi = await _run("asgi", _asgi_middleware_app(), args.requests)
+    print(
+        f"middleware overhead: function {(function - bare) * 1e6:.1f} us, "
+        f"asgi {(asgi - bare) * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
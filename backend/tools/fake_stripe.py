@@ -0,0 +1,139 @@
+"""
+Minimal local stand-in for the Stripe PaymentIntents API.
+
+    uvicorn tools.fake_stripe:app --port 12111
+    STRIPE_API_BASE=http://127.0.0.1:12111 uvicorn app.main:app
+
+FAKE_STRIPE_LATENCY_MS simulates the network round trip (default 300ms).
+Idempotency-Key is honoured like the real API: a repeated key returns the
+original object. POST /v1/refunds refunds an intent in full.
+POST /_test/payment_intents/{id}/status moves an intent to another status
+(e.g. "succeeded") for reconciliation tests.
+"""
+import asyncio
+import os
+import time
+import uuid
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Stripe")
+
+LATENCY = float(os.getenv("FAKE_STRIPE_LATENCY_MS", "300")) / 1000
+intents = {}
+refunds = {}
+idempotency = {}
+stats = {"created": 0, "replayed": 0, "started": time.time()}
+
+
+def _unflatten(form) -> dict:
+    """metadata[order_id]=1 -> {"metadata": {"order_id": "1"}}"""
+    data = {}
+    for key, value in form.items():
+        if "[" in key:
+            outer, inner = key.split("[", 1)
+            data.setdefault(outer, {})[inner.rstrip("]")] = value
+        else:
+            data[key] = value
+    return data
+
+
+@app.post("/v1/payment_intents")
+async def create_payment_intent(request: Request):
+    await asyncio.sleep(LATENCY)
+    key = request.headers.get("Idempotency-Key")
+    if key and key in idempotency:
+        stats["replayed"] += 1
+        return intents[idempotency[key]]
+
+    data = _unflatten(await request.form())
+    intent_id = f"pi_fake_{uuid.uuid4().hex[:20]}"
+    intent = {
+        "id": intent_id,
+        "object": "payment_intent",
+        "amount": int(data.get("amount", 0)),
+        "currency": data.get("currency", "usd"),
+        "status": "requires_payment_method",
+        "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+        "metadata": data.get("metadata", {}),
+        "created": int(time.time()),
+    }
+    intents[intent_id] = intent
+    if key:
+        idempotency[key] = intent_id
+    stats["created"] += 1
+    return intent
+
+
+@app.get("/v1/payment_intents/{intent_id}")
+async def retrieve_payment_intent(intent_id: str):
+    await asyncio.sleep(LATENCY)
+    if intent_id not in intents:
+        # Stripe's error envelope is top level; the client maps it to InvalidRequestError
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": {
+                    "type": "invalid_request_error",
+                    "code": "resource_missing",
+                    "param": "intent",
+                    "message": f"No such payment_intent: '{intent_id}'",
+                }
+            },
+        )
+    return intents[intent_id]
+
+
+@app.post("/v1/refunds")
+async def create_refund(request: Request):
+    await asyncio.sleep(LATENCY)
+    key = request.headers.get("Idempotency-Key")
+    if key and key in idempotency:
+        stats["replayed"] += 1
+        return refunds[idempotency[key]]
+
+    data = _unflatten(await request.form())
+    intent = intents.get(data.get("payment_intent"))
+    if intent is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "error": {
+                    "type": "invalid_request_error",
+                    "code": "resource_missing",
+                    "param": "payment_intent",
+                    "message": f"No such payment_intent: '{data.get('payment_intent')}'",
+                }
+            },
+        )
+    refund_id = f"re_fake_{uuid.uuid4().hex[:20]}"
+    refund = {
+        "id": refund_id,
+        "object": "refund",
+        "amount": intent["amount"],
+        "payment_intent": intent["id"],
+        "status": "succeeded",
+        "metadata": data.get("metadata", {}),
+        "created": int(time.time()),
+    }
+    refunds[refund_id] = refund
+    if key:
+        idempotency[key] = refund_id
+    return refund
+
+
+@app.post("/_test/payment_intents/{intent_id}/status")
+async def set_payment_intent_status(intent_id: str, request: Request):
+    body = await request.json()
+    if intent_id not in intents:
+        raise HTTPException(status_code=404, detail="No such intent")
+    intents[intent_id]["status"] = body["status"]
+    if body.get("last_payment_error"):
+        intents[intent_id]["last_payment_error"] = body["last_payment_error"]
+    return intents[intent_id]
+
+
+@app.get("/_stats")
+def get_stats():
+    elapsed = time.time() - stats["started"]
+    return {**stats, "elapsed_s": round(elapsed, 2)}